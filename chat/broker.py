@@ -0,0 +1,239 @@
+"""
+Broker for chat.layers.UnixSocketChannelLayer.
+
+A single asyncio process per host owns all channel queues and groups; ASGI
+workers talk to it over a Unix domain socket with length-prefixed msgpack
+frames. It does not import Django so it can be started cheaply, either by
+the first worker that needs it or by ``manage.py run_chat_broker``.
+"""
+import argparse
+import asyncio
+import collections
+import fcntl
+import json
+import os
+import re
+import signal
+import struct
+import time
+import msgpack
+
+HEADER = struct.Struct('!I')
+MAX_FRAME = 16 * 1024 * 1024
+SWEEP_INTERVAL = 5
+
+
+async def read_frame(reader):
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_FRAME:
+        raise ValueError(f'Frame of {length} bytes exceeds the limit')
+    return msgpack.unpackb(await reader.readexactly(length), raw=False)
+
+
+def write_frame(writer, obj):
+    data = msgpack.packb(obj, use_bin_type=True)
+    # a single write() per frame, so frames from concurrent tasks never interleave
+    writer.write(HEADER.pack(len(data)) + data)
+
+
+class Broker:
+    """
+    Channel queues, receive waiters and group memberships. Message payloads
+    are kept as the msgpack bytes the sender produced: a group_send is
+    encoded once by the sender and the same bytes are queued for every member.
+    """
+
+    def __init__(self, expiry=60, group_expiry=86400, capacity=100, channel_capacity=()):
+        self.expiry = expiry
+        self.group_expiry = group_expiry
+        self.capacity = capacity
+        self.channel_capacity = [(re.compile(pattern), value)
+                                 for pattern, value in channel_capacity]
+        self.queues = {}   # channel -> deque of (expires_at, payload)
+        self.waiters = {}  # channel -> deque of futures from pending receives
+        self.groups = {}   # group -> {channel: expires_at}
+
+    def get_capacity(self, channel):
+        for pattern, capacity in self.channel_capacity:
+            if pattern.match(channel):
+                return capacity
+        return self.capacity
+
+    def deliver(self, channel, payload):
+        """Hand ``payload`` to a waiting receiver or queue it; False if the channel is full."""
+        waiters = self.waiters.get(channel)
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(payload)
+                return True
+        queue = self.queues.setdefault(channel, collections.deque())
+        if len(queue) >= self.get_capacity(channel):
+            return False
+        queue.append((time.monotonic() + self.expiry, payload))
+        return True
+
+    async def receive(self, channel):
+        queue = self.queues.get(channel)
+        now = time.monotonic()
+        while queue:
+            expires_at, payload = queue.popleft()
+            if expires_at > now:
+                return payload
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(channel, collections.deque()).append(waiter)
+        return await waiter
+
+    def group_add(self, group, channel):
+        self.groups.setdefault(group, {})[channel] = time.monotonic() + self.group_expiry
+
+    def group_discard(self, group, channel):
+        members = self.groups.get(group)
+        if members is not None:
+            members.pop(channel, None)
+            if not members:
+                del self.groups[group]
+
+    def group_send(self, group, payload):
+        now = time.monotonic()
+        members = self.groups.get(group, {})
+        for channel, expires_at in list(members.items()):
+            if expires_at <= now:
+                del members[channel]
+            else:
+                # a full member just misses the message, like in other layers
+                self.deliver(channel, payload)
+
+    def flush(self):
+        for waiters in self.waiters.values():
+            for waiter in waiters:
+                waiter.cancel()
+        self.queues.clear()
+        self.waiters.clear()
+        self.groups.clear()
+
+    def sweep(self):
+        """Drop expired messages and memberships, and forget idle channels."""
+        now = time.monotonic()
+        for channel, queue in list(self.queues.items()):
+            while queue and queue[0][0] <= now:
+                queue.popleft()
+            if not queue:
+                del self.queues[channel]
+        for channel, waiters in list(self.waiters.items()):
+            while waiters and waiters[0].done():
+                waiters.popleft()
+            if not waiters:
+                del self.waiters[channel]
+        for group, members in list(self.groups.items()):
+            for channel, expires_at in list(members.items()):
+                if expires_at <= now:
+                    del members[channel]
+            if not members:
+                del self.groups[group]
+
+    async def handle_client(self, reader, writer):
+        receives = {}  # request id -> task of a pending receive
+
+        async def answer_receive(request_id, channel):
+            try:
+                payload = await self.receive(channel)
+            except asyncio.CancelledError:
+                return
+            finally:
+                receives.pop(request_id, None)
+            write_frame(writer, {'id': request_id, 'message': payload})
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+        try:
+            while True:
+                request = await read_frame(reader)
+                op, request_id = request['op'], request.get('id')
+                if op == 'receive':
+                    receives[request_id] = asyncio.ensure_future(
+                        answer_receive(request_id, request['channel']))
+                    continue
+                if op == 'cancel':
+                    task = receives.pop(request['target'], None)
+                    if task is not None:
+                        task.cancel()
+                    continue
+                reply = {'id': request_id}
+                if op == 'send':
+                    reply['full'] = not self.deliver(request['channel'], request['message'])
+                elif op == 'group_add':
+                    self.group_add(request['group'], request['channel'])
+                elif op == 'group_discard':
+                    self.group_discard(request['group'], request['channel'])
+                elif op == 'group_send':
+                    self.group_send(request['group'], request['message'])
+                elif op == 'flush':
+                    self.flush()
+                else:
+                    reply['error'] = f'Unknown operation {op!r}'
+                write_frame(writer, reply)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except (ValueError, KeyError, TypeError, msgpack.UnpackException):
+            # a client that sends garbage is disconnected, the broker keeps running
+            pass
+        finally:
+            for task in receives.values():
+                task.cancel()
+            writer.close()
+
+    async def sweeper(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            self.sweep()
+
+
+async def serve(path, **config):
+    broker = Broker(**config)
+    if os.path.exists(path):
+        # left behind by a broker that died; we hold the lock, so it is stale
+        os.unlink(path)
+    server = await asyncio.start_unix_server(broker.handle_client, path)
+    os.chmod(path, 0o600)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    sweeper = asyncio.ensure_future(broker.sweeper())
+    try:
+        await stop.wait()
+    finally:
+        sweeper.cancel()
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def run(path, **config):
+    """
+    Run the broker for ``path`` until SIGINT/SIGTERM. Returns False at once
+    if another broker already serves that path.
+    """
+    lock = open(f'{path}.lock', 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return False
+    try:
+        asyncio.run(serve(path, **config))
+    finally:
+        lock.close()
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path')
+    parser.add_argument('--config', default='{}', help='Broker options as JSON.')
+    args = parser.parse_args()
+    run(args.path, **json.loads(args.config))
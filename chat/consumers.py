@@ -1,23 +1,66 @@
-import json
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
 from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
 from django.utils import timezone
+from courses.enrollment import ais_enrolled
+from . import frames, metrics
+from .outbound import OutboundQueue
+from .presence import presence
+from .ratelimit import check_history, check_message
+from .history import get_history, mark_history_read, parse_history_params, room_name, subscribe
+from .persistence import message_buffer
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    outbound = None
+    cleaned_up = False
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # also when a handler raised and disconnect() never ran: a dead
+            # consumer must not stay in the room's presence or group
+            await self.clean_up()
+
     async def connect(self):
         self.user = self.scope['user']
         self.id = self.scope['url_route']['kwargs']['course_id']
-        self.room_group_name = f'chat_{self.id}'
+        self.room_group_name = room_name(self.id)
+        # reject anonymous and unenrolled users before they join the group;
+        # the check is a cache hit for everyone who connected recently
+        if not await ais_enrolled(self.user, self.id):
+            await self.close()
+            return
         # join room group
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
-        # accept connection
-        await self.accept()
+        # accept connection, in msgpack if the client offered it
+        subprotocol = frames.choose_subprotocol(self.scope.get('subprotocols', []))
+        self.binary = subprotocol == frames.MSGPACK_SUBPROTOCOL
+        await self.accept(subprotocol)
+        self.outbound = OutboundQueue(self, binary=self.binary)
+        self.last_seen = time.monotonic()
+        self.subscriber = await database_sync_to_async(subscribe)(self.room_group_name, self.user)
+        # replay the latest messages so (re)joining clients can catch up,
+        # with how many arrived since the user last read the room; no flush
+        # here, or every (re)connect would force a database write
+        await self.send_history({}, flush=False, unread=self.subscriber.unread)
+        await self.send_frame({'presence': await presence.join(self.room_group_name, self)})
 
     async def disconnect(self, close_code):
+        await self.clean_up()
+
+    async def clean_up(self):
+        if self.cleaned_up or not hasattr(self, 'room_group_name'):
+            return
+        self.cleaned_up = True
+        if self.outbound is not None:
+            self.outbound.stop()
+            await presence.leave(self.room_group_name, self)
         # leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -25,22 +68,84 @@ class ChatConsumer(AsyncWebsocketConsumer):
         )
 
     # receive message from WebSocket
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message = text_data_json['message']
+    async def receive(self, text_data=None, bytes_data=None):
+        # any frame counts as a presence heartbeat
+        self.last_seen = time.monotonic()
+        try:
+            data = frames.decode(text_data, bytes_data)
+        except frames.FrameError as e:
+            await self.send_frame({'error': str(e)})
+            return
+        if data.get('command') == 'heartbeat':
+            return
+        if data.get('command') == 'history':
+            retry_after = check_history(self.user.id)
+            if retry_after is not None:
+                metrics.incr('chat.ratelimit.rejected.history')
+                await self.send_frame({'error': 'Too many history requests, slow down.',
+                                       'retry_after': round(retry_after, 2)})
+                return
+            await self.send_history(data)
+            return
+        message = data.get('message')
+        if not isinstance(message, str):
+            await self.send_frame({'error': 'message must be a string.'})
+            return
+        limited = check_message(self.user.id, self.room_group_name)
+        if limited is not None:
+            scope, retry_after = limited
+            metrics.incr(f'chat.ratelimit.rejected.{scope}')
+            await self.send_frame({'error': 'Too many messages, slow down.',
+                                   'retry_after': round(retry_after, 2)})
+            return
         now = timezone.now()
-        # send message to room group
+        # send message to room group, encoded once for all recipients
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'chat_message',
-                'message': message,
-                'user': self.user.username,
-                'datetime': now.isoformat(),
+                **frames.encode({
+                    'message': message,
+                    'user': self.user.username,
+                    'datetime': now.isoformat(),
+                }),
             }
         )
+        if self.user.is_authenticated:
+            # stored in the background by the shared write-behind buffer
+            await message_buffer.add(self.room_group_name, self.user.id, message, now)
 
     # receive message from room group
     async def chat_message(self, event):
-        # send message to WebSocket
-        await self.send(text_data=json.dumps(event))
+        # forward the pre-encoded frame to WebSocket
+        await self.send_encoded(event)
+
+    async def send_encoded(self, frame):
+        await self.queue(frame['bytes'] if self.binary else frame['text'])
+
+    async def send_frame(self, payload):
+        # frames for this socket only (history, errors): encode just one format
+        await self.queue(frames.to_bytes(payload) if self.binary else frames.to_text(payload))
+
+    async def queue(self, frame):
+        # every outgoing frame goes through the queue, so they stay in order
+        if not self.outbound.put(frame):
+            await self.outbound.evict()
+
+    async def send_history(self, params, flush=True, **extra):
+        try:
+            params = parse_history_params(params)
+        except ValueError as e:
+            await self.send_frame({'error': str(e)})
+            return
+        if flush:
+            # messages from this process may still be waiting in the buffer
+            await message_buffer.flush()
+        history = await database_sync_to_async(self.read_history)(params)
+        await self.send_frame({**history, **extra})
+
+    def read_history(self, params):
+        history = get_history(self.room_group_name, **params)
+        # what was delivered counts as read
+        mark_history_read(self.subscriber, history)
+        return history
@@ -0,0 +1,50 @@
+import json
+import msgpack
+
+# WebSocket subprotocols a client may offer; without one the socket speaks JSON
+MSGPACK_SUBPROTOCOL = 'chat.msgpack'
+JSON_SUBPROTOCOL = 'chat.json'
+
+
+def to_text(payload):
+    return json.dumps(payload)
+
+
+def to_bytes(payload):
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def encode(payload):
+    """
+    Serialize a client frame in both wire formats. Done once by the sender of
+    a group message; every recipient forwards whichever encoding its socket
+    negotiated instead of serializing the event again.
+    """
+    return {
+        'text': to_text(payload),
+        'bytes': to_bytes(payload),
+    }
+
+
+class FrameError(ValueError):
+    """A client frame that is not a JSON/msgpack object."""
+
+
+def decode(text_data=None, bytes_data=None):
+    try:
+        if bytes_data is not None:
+            data = msgpack.unpackb(bytes_data, raw=False)
+        else:
+            data = json.loads(text_data)
+    except (ValueError, TypeError, RecursionError, msgpack.UnpackException):
+        raise FrameError('Frames must be valid JSON or msgpack.')
+    if not isinstance(data, dict):
+        raise FrameError('Frames must be objects.')
+    return data
+
+
+def choose_subprotocol(offered):
+    for subprotocol in (MSGPACK_SUBPROTOCOL, JSON_SUBPROTOCOL):
+        if subprotocol in offered:
+            return subprotocol
+    return None
@@ -0,0 +1,76 @@
+from django.conf import settings
+from .models import ChatPublisher, PublishedMessage, RoomSubscriber
+
+# messages replayed to a socket right after it connects
+REPLAY_MESSAGES = getattr(settings, 'CHAT_REPLAY_MESSAGES', 50)
+# upper bound for one history page, whatever the client asks for
+MAX_HISTORY_PAGE = getattr(settings, 'CHAT_MAX_HISTORY_PAGE', 100)
+
+
+def room_name(course_id):
+    return f'chat_{course_id}'
+
+
+def subscribe(room, user):
+    """
+    Subscribe ``user`` to ``room`` (once) and return the subscription,
+    annotated with ``unread``: the messages newer than its read cursor.
+    """
+    publisher = ChatPublisher.objects.get_or_create(name=room)[0]
+    RoomSubscriber.objects.get_or_create(user=user, publisher=publisher)
+    return RoomSubscriber.objects.with_unread_count().get(user=user, publisher=publisher)
+
+
+def mark_history_read(subscriber, history):
+    """Move ``subscriber``'s read cursor past a page returned by ``get_history``."""
+    if history['history']:
+        subscriber.mark_read(max(message['id'] for message in history['history']))
+
+
+def parse_history_params(params):
+    """
+    Read ``before``, ``after`` and ``limit`` from a query dict or a
+    WebSocket command. Raises ValueError for anything that is not an id.
+    """
+    before, after = params.get('before'), params.get('after')
+    if before is not None and after is not None:
+        raise ValueError('Use either before or after, not both.')
+    try:
+        limit = int(params.get('limit') or REPLAY_MESSAGES)
+        return {
+            'before': int(before) if before is not None else None,
+            'after': int(after) if after is not None else None,
+            'limit': max(1, min(limit, MAX_HISTORY_PAGE)),
+        }
+    except (TypeError, ValueError):
+        raise ValueError('before, after and limit must be integers.')
+
+
+def get_history(room, before=None, after=None, limit=REPLAY_MESSAGES):
+    """
+    Keyset page of a room's messages, oldest first. ``before`` returns the
+    page just older than that message id (the latest page when neither is
+    given), ``after`` the page just newer. Both are range scans on the
+    (publisher, id) index; no OFFSET is ever used.
+    """
+    messages = PublishedMessage.objects.filter(publisher__name=room)
+    if after is not None:
+        messages = messages.filter(id__gt=after).order_by('id')
+    else:
+        if before is not None:
+            messages = messages.filter(id__lt=before)
+        messages = messages.order_by('-id')
+    rows = list(messages.values('id', 'content', 'timestamp', 'user__username')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after is None:
+        rows.reverse()
+    return {
+        'history': [{
+            'id': row['id'],
+            'message': row['content'],
+            'user': row['user__username'],
+            'datetime': row['timestamp'].isoformat(),
+        } for row in rows],
+        'has_more': has_more,
+    }
@@ -0,0 +1,195 @@
+import asyncio
+import itertools
+import json
+import subprocess
+import sys
+import uuid
+from pathlib import Path
+import msgpack
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from .broker import read_frame, write_frame
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+class BrokerConnection:
+    """
+    One Unix socket connection to the broker, bound to the event loop that
+    opened it. Requests are pipelined: each carries an id and its reply is
+    matched back, so a blocking receive does not hold up other operations.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.reader_task = asyncio.ensure_future(self.read_replies())
+
+    async def read_replies(self):
+        try:
+            while True:
+                reply = await read_frame(self.reader)
+                future = self.pending.pop(reply['id'], None)
+                if future is not None and not future.done():
+                    future.set_result(reply)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            error = ConnectionError(f'Lost connection to the chat broker: {e}')
+        except (ValueError, KeyError, TypeError, msgpack.UnpackException) as e:
+            # oversized or undecodable frame: the stream cannot be trusted any more
+            self.writer.close()
+            error = ConnectionError(f'Invalid frame from the chat broker: {e!r}')
+        except asyncio.CancelledError:
+            error = ConnectionError('Connection to the chat broker was closed')
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+    @property
+    def alive(self):
+        return not self.reader_task.done()
+
+    def start(self, op, **fields):
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        write_frame(self.writer, dict(fields, op=op, id=request_id))
+        return request_id, future
+
+    async def request(self, op, **fields):
+        _, future = self.start(op, **fields)
+        await self.writer.drain()
+        reply = await future
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return reply
+
+    def cancel(self, request_id):
+        self.pending.pop(request_id, None)
+        if self.alive:
+            write_frame(self.writer, {'op': 'cancel', 'target': request_id})
+
+    def close(self):
+        self.reader_task.cancel()
+        self.writer.close()
+
+
+class UnixSocketChannelLayer(BaseChannelLayer):
+    """
+    Channel layer shared by all ASGI workers of one host through a broker
+    process (chat.broker) listening on a Unix domain socket. Supports
+    groups, message and group expiry, and per-channel capacity.
+
+    With ``autostart`` the first worker that finds no broker starts one; a
+    file lock next to the socket makes sure only one of them keeps running.
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, path=None, expiry=60, group_expiry=86400, capacity=100,
+                 channel_capacity=None, autostart=True, connect_timeout=5, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, **kwargs)
+        self.path = str(path or PROJECT_DIR / 'chat-layer.sock')
+        self.group_expiry = group_expiry
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self.autostart = autostart
+        self.connect_timeout = connect_timeout
+        self.connections = {}  # event loop -> BrokerConnection
+
+    @property
+    def broker_config(self):
+        return {
+            'expiry': self.expiry,
+            'group_expiry': self.group_expiry,
+            'capacity': self.capacity,
+            'channel_capacity': [(pattern.pattern, value)
+                                 for pattern, value in self.channel_capacity],
+        }
+
+    def start_broker(self):
+        subprocess.Popen(
+            [sys.executable, '-m', 'chat.broker', self.path,
+             '--config', json.dumps(self.broker_config)],
+            cwd=PROJECT_DIR, start_new_session=True,
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+
+    async def open_connection(self):
+        deadline = asyncio.get_running_loop().time() + self.connect_timeout
+        started = False
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+                return BrokerConnection(reader, writer)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if not self.autostart or asyncio.get_running_loop().time() > deadline:
+                    raise
+                if not started:
+                    self.start_broker()
+                    started = True
+                await asyncio.sleep(0.05)
+
+    async def get_connection(self):
+        loop = asyncio.get_running_loop()
+        connection = self.connections.get(loop)
+        if connection is None or not connection.alive:
+            # forget connections of event loops that are gone
+            for other in [other for other in self.connections if other.is_closed()]:
+                del self.connections[other]
+            connection = self.connections[loop] = await self.open_connection()
+        return connection
+
+    def encode(self, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        return msgpack.packb(message, use_bin_type=True)
+
+    async def send(self, channel, message):
+        self.require_valid_channel_name(channel)
+        connection = await self.get_connection()
+        reply = await connection.request('send', channel=channel,
+                                         message=self.encode(message))
+        if reply['full']:
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        connection = await self.get_connection()
+        request_id, future = connection.start('receive', channel=channel)
+        try:
+            reply = await future
+        except asyncio.CancelledError:
+            # the consumer went away: the broker must not hand this receive a message
+            connection.cancel(request_id)
+            raise
+        return msgpack.unpackb(reply['message'], raw=False)
+
+    async def new_channel(self, prefix='specific'):
+        return f'{prefix}.unix!{uuid.uuid4().hex}'
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        connection = await self.get_connection()
+        await connection.request('group_add', group=group, channel=channel)
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        connection = await self.get_connection()
+        await connection.request('group_discard', group=group, channel=channel)
+
+    async def group_send(self, group, message):
+        self.require_valid_group_name(group)
+        connection = await self.get_connection()
+        # encoded once here; the broker queues the same bytes for every member
+        await connection.request('group_send', group=group, message=self.encode(message))
+
+    async def flush(self):
+        connection = await self.get_connection()
+        await connection.request('flush')
+
+    async def close(self):
+        connection = self.connections.pop(asyncio.get_running_loop(), None)
+        if connection is not None:
+            connection.close()
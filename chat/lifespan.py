@@ -0,0 +1,16 @@
+from .persistence import message_buffer
+
+
+async def lifespan(scope, receive, send):
+    """
+    ASGI lifespan handler: flush buffered chat messages before the server
+    stops, so a restart does not lose the last batch.
+    """
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await message_buffer.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
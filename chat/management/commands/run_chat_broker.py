@@ -0,0 +1,21 @@
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+from chat import broker
+from chat.layers import UnixSocketChannelLayer
+
+
+class Command(BaseCommand):
+    help = 'Run the broker process of the Unix socket channel layer in the foreground.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--layer', default='default',
+                            help='Alias of the channel layer in CHANNEL_LAYERS.')
+
+    def handle(self, *args, **options):
+        layer = get_channel_layer(options['layer'])
+        if not isinstance(layer, UnixSocketChannelLayer):
+            raise CommandError(f"Channel layer '{options['layer']}' does not use "
+                               f"chat.layers.UnixSocketChannelLayer.")
+        self.stdout.write(f'Chat broker listening on {layer.path}')
+        if not broker.run(layer.path, **layer.broker_config):
+            raise CommandError(f'Another broker is already serving {layer.path}.')
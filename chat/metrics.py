@@ -0,0 +1,22 @@
+import threading
+
+# Process-local counters and gauges for the chat subsystem. Every worker
+# process keeps its own numbers; they are exposed as JSON by
+# chat.views.chat_metrics for scraping.
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def set_gauge(name, value):
+    _gauges[name] = value
+
+
+def snapshot():
+    with _lock:
+        return {'counters': dict(_counters), 'gauges': dict(_gauges)}
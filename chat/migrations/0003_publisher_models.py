@@ -0,0 +1,68 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_alter_userchat_unique_together_remove_userchat_room_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='chatroom',
+            name='observers',
+        ),
+        migrations.AlterUniqueTogether(
+            name='roomobserver',
+            unique_together=None,
+        ),
+        migrations.DeleteModel(
+            name='RoomObserver',
+        ),
+        migrations.DeleteModel(
+            name='ChatMessage',
+        ),
+        migrations.DeleteModel(
+            name='ChatRoom',
+        ),
+        migrations.CreateModel(
+            name='ChatPublisher',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PublishedMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField()),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('publisher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='chat.chatpublisher')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['timestamp'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RoomSubscriber',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('publisher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chat.chatpublisher')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['joined_at'],
+                'unique_together': {('user', 'publisher')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_publisher_models'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='publishedmessage',
+            options={'ordering': ['id']},
+        ),
+        migrations.AddField(
+            model_name='roomsubscriber',
+            name='last_read_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='chatpublisher',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='publishedmessage',
+            index=models.Index(fields=['publisher', 'id'], name='chat_message_room_id_idx'),
+        ),
+    ]
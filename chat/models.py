@@ -1,5 +1,7 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 class Subscriber(models.Model):
     class Meta:
@@ -8,10 +10,26 @@ class Subscriber(models.Model):
     def update(self, event_type, data):
         raise NotImplementedError
 
+class RoomSubscriberQuerySet(models.QuerySet):
+    def with_unread_count(self):
+        # one index range scan on (publisher, id) per subscription
+        unread = PublishedMessage.objects.filter(
+            publisher=models.OuterRef('publisher'),
+            id__gt=models.OuterRef('last_read_id'),
+        ).order_by().values('publisher').annotate(n=models.Count('id')).values('n')
+        # not "unread_count": that would shadow RoomSubscriber.unread_count()
+        return self.annotate(unread=Coalesce(
+            models.Subquery(unread), 0))
+
+
 class RoomSubscriber(Subscriber):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     publisher = models.ForeignKey('ChatPublisher', on_delete=models.CASCADE)
     joined_at = models.DateTimeField(auto_now_add=True)
+    # read cursor: id of the last message this user has seen in the room
+    last_read_id = models.PositiveBigIntegerField(default=0)
+
+    objects = RoomSubscriberQuerySet.as_manager()
 
     class Meta:
         unique_together = ('user', 'publisher')
@@ -21,12 +39,26 @@ class RoomSubscriber(Subscriber):
         return f"{self.user} subscribed to {self.publisher.name} since {self.joined_at}"
 
     def update(self, event_type, data):
-        if event_type == "message":
-            PublishedMessage.objects.create(publisher=self.publisher, user=self.user, content=data["content"])
+        # messages are stored once per room; the sender has read their own
+        if event_type == "message" and data["message"].user_id == self.user_id:
+            self.mark_read(data["message"].id)
+
+    def unread_count(self):
+        return self.publisher.messages.filter(id__gt=self.last_read_id).count()
+
+    def mark_read(self, message_id=None):
+        """Move the read cursor forward to ``message_id`` (default: latest message)."""
+        if message_id is None:
+            message_id = self.publisher.messages.aggregate(
+                last=models.Max('id'))['last'] or 0
+        # never move the cursor backwards, even with concurrent readers
+        RoomSubscriber.objects.filter(pk=self.pk, last_read_id__lt=message_id) \
+                              .update(last_read_id=message_id)
+        self.last_read_id = max(self.last_read_id, message_id)
 
 
 class ChatPublisher(models.Model):
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __init__(self, *args, **kwargs):
@@ -51,19 +83,28 @@ class ChatPublisher(models.Model):
         for subscriber in self.listeners.get(event_type, []):
             subscriber.update(event_type, data)
 
-    def publish(self, content):
-        self.listeners["message"] = list(self.roomsubscriber_set.all())
-        self.notify("message", {"publisher": self, "content": content})
+    def publish(self, user, content):
+        # fan-out on read: one row per message, subscribers only keep a cursor
+        message = PublishedMessage.objects.create(publisher=self, user=user, content=content)
+        self.notify("message", {"publisher": self, "message": message})
+        return message
 
 
 class PublishedMessage(models.Model):
     publisher = models.ForeignKey(ChatPublisher, related_name='messages', on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # not auto_now_add: buffered messages keep the time they were sent,
+    # not the time the batch was written
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
-        ordering = ['timestamp']
+        # ids grow in send order, and (publisher, id) is the index history,
+        # unread counts and read cursors scan
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['publisher', 'id'], name='chat_message_room_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} at {self.timestamp}: {self.content[:50]}..."
@@ -0,0 +1,80 @@
+import asyncio
+import collections
+import msgpack
+from django.conf import settings
+from . import metrics
+
+# frames a connection may have waiting before it counts as a slow consumer
+MAX_DEPTH = getattr(settings, 'CHAT_OUTBOUND_MAX_DEPTH', 200)
+# frames queued within this window are sent as one WebSocket frame
+COALESCE_DELAY = getattr(settings, 'CHAT_OUTBOUND_COALESCE_MS', 5) / 1000
+# close code for evicted slow consumers (4000-4999 is for applications)
+CLOSE_SLOW_CONSUMER = 4008
+
+
+class OutboundQueue:
+    """
+    Send queue of one WebSocket. Frames are already encoded (JSON text or
+    msgpack bytes, never both); a writer task sends them in batches so
+    awaiting a slow socket never holds up the group event handlers, and
+    the queue never grows past ``max_depth``.
+    """
+
+    def __init__(self, consumer, binary=False, max_depth=MAX_DEPTH,
+                 coalesce_delay=COALESCE_DELAY):
+        self.consumer = consumer
+        self.binary = binary
+        self.max_depth = max_depth
+        self.coalesce_delay = coalesce_delay
+        self.frames = collections.deque()
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.writer = asyncio.ensure_future(self.write())
+
+    def put(self, frame):
+        """Queue an encoded frame; False if the connection is over its budget."""
+        if self.closed:
+            return True
+        if len(self.frames) >= self.max_depth:
+            return False
+        self.frames.append(frame)
+        self.ready.set()
+        return True
+
+    def join(self, frames):
+        # frames are joined without decoding them: a JSON array of the JSON
+        # texts, or a msgpack array header followed by the packed items
+        if len(frames) == 1:
+            return frames[0]
+        metrics.incr('chat.outbound.coalesced', len(frames))
+        if self.binary:
+            return msgpack.Packer().pack_array_header(len(frames)) + b''.join(frames)
+        return '[' + ','.join(frames) + ']'
+
+    async def write(self):
+        while True:
+            await self.ready.wait()
+            if self.coalesce_delay:
+                await asyncio.sleep(self.coalesce_delay)
+            self.ready.clear()
+            frames = list(self.frames)
+            self.frames.clear()
+            if not frames:
+                continue
+            frame = self.join(frames)
+            if self.binary:
+                await self.consumer.send(bytes_data=frame)
+            else:
+                await self.consumer.send(text_data=frame)
+
+    async def evict(self):
+        """Drop everything still queued and close the socket as a slow consumer."""
+        metrics.incr('chat.outbound.evicted')
+        metrics.incr('chat.outbound.dropped', len(self.frames) + 1)
+        self.stop()
+        await self.consumer.close(code=CLOSE_SLOW_CONSUMER)
+
+    def stop(self):
+        self.closed = True
+        self.frames.clear()
+        self.writer.cancel()
@@ -0,0 +1,124 @@
+import asyncio
+import atexit
+import logging
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from . import metrics
+from .models import ChatPublisher, PublishedMessage
+
+logger = logging.getLogger(__name__)
+
+# flush as soon as this many messages are pending...
+BATCH_SIZE = getattr(settings, 'CHAT_PERSIST_BATCH_SIZE', 200)
+# ...or after this many seconds, whichever comes first
+FLUSH_INTERVAL = getattr(settings, 'CHAT_PERSIST_FLUSH_INTERVAL', 0.5)
+# above this depth, senders wait for the flush instead of queueing more
+MAX_PENDING = getattr(settings, 'CHAT_PERSIST_MAX_PENDING', 10000)
+
+
+class MessageBuffer:
+    """
+    Write-behind buffer shared by all chat consumers of a process.
+    Messages are queued in memory and written with one bulk_create per
+    batch, so consumers never wait on a database round trip per message.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_pending=MAX_PENDING):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []
+        self._publishers = {}  # room name -> ChatPublisher id
+        self._timer = None
+        self._flushing = None
+
+    @property
+    def depth(self):
+        return len(self._pending)
+
+    def _update_depth(self):
+        metrics.set_gauge('chat.persist.queue_depth', len(self._pending))
+
+    async def add(self, room, user_id, content, timestamp):
+        self._pending.append((room, user_id, content, timestamp))
+        self._update_depth()
+        if len(self._pending) >= self.max_pending:
+            # backpressure: the database is falling behind
+            await self.flush()
+        elif len(self._pending) >= self.batch_size:
+            self._start_flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    def _start_flush(self):
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        """
+        Write everything pending. Concurrent flushes take disjoint batches;
+        the writes themselves run one after another on the shared sync thread.
+        """
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            self._update_depth()
+            await database_sync_to_async(self.write)(batch)
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        await self.flush()
+
+    def flush_sync(self):
+        """Blocking flush for shutdown paths without a running event loop."""
+        pending, self._pending = self._pending, []
+        self._update_depth()
+        for start in range(0, len(pending), self.batch_size):
+            self.write(pending[start:start + self.batch_size])
+
+    def write(self, batch):
+        """
+        Write ``batch`` with one bulk_create. If that fails, the batch is
+        retried in halves, so a bad row (e.g. from a user deleted meanwhile)
+        only costs its own message and O(log n) extra queries.
+        """
+        try:
+            publishers = self._get_publishers({room for room, *_ in batch})
+            with transaction.atomic():
+                PublishedMessage.objects.bulk_create([
+                    PublishedMessage(publisher_id=publishers[room], user_id=user_id,
+                                     content=content, timestamp=timestamp)
+                    for room, user_id, content, timestamp in batch])
+        except Exception:
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                self.write(batch[:middle])
+                self.write(batch[middle:])
+                return
+            # a failing message must not wedge the buffer for every room
+            logger.exception('Could not persist chat message in room %s', batch[0][0])
+            metrics.incr('chat.persist.failed')
+        else:
+            metrics.incr('chat.persist.written', len(batch))
+
+    def _get_publishers(self, rooms):
+        missing = rooms - self._publishers.keys()
+        if missing:
+            for publisher in ChatPublisher.objects.filter(name__in=missing):
+                self._publishers.setdefault(publisher.name, publisher.pk)
+            for room in missing - self._publishers.keys():
+                # get_or_create: another worker may create the room concurrently
+                self._publishers[room] = ChatPublisher.objects.get_or_create(name=room)[0].pk
+        return self._publishers
+
+
+message_buffer = MessageBuffer()
+# servers without ASGI lifespan support (e.g. daphne) still flush on exit
+atexit.register(message_buffer.flush_sync)
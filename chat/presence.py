@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import time
+from channels.layers import get_channel_layer
+from django.conf import settings
+from . import frames
+
+logger = logging.getLogger(__name__)
+
+# each process re-announces its sockets this often...
+HEARTBEAT_INTERVAL = getattr(settings, 'CHAT_PRESENCE_HEARTBEAT', 15)
+# ...and forgets connections (remote ones, or local sockets that sent no
+# frame at all) silent for longer than this
+TIMEOUT = getattr(settings, 'CHAT_PRESENCE_TIMEOUT', 45)
+# presence diffs are pushed to clients at most once per interval
+DIFF_INTERVAL = getattr(settings, 'CHAT_PRESENCE_DIFF_INTERVAL', 1.0)
+# how long the first socket of a room in this process waits for other
+# workers to report their members before it gets its snapshot
+SYNC_TIMEOUT = getattr(settings, 'CHAT_PRESENCE_SYNC_TIMEOUT', 0.25)
+
+
+class RoomPresence:
+    """
+    Who is online in one room, as seen by this process: every connection in
+    the room (from all workers) keyed by user, so counts are O(1) and a
+    snapshot is a single pass over the users. Joins and leaves since the
+    last push are kept as a diff.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.members = {}  # username -> {channel name: expires at}
+        self.local = {}    # channel name -> consumer, sockets of this process
+        self.joined = set()
+        self.left = set()
+        self.listener = None
+        self.listener_channel = None
+        # set once another worker answered our presence.sync (or nobody did)
+        self.synced = asyncio.Event()
+
+    @property
+    def group(self):
+        return f'presence_{self.name}'
+
+    @property
+    def online(self):
+        return len(self.members)
+
+    def add(self, user, channel, expires_at):
+        connections = self.members.get(user)
+        if connections is None:
+            connections = self.members[user] = {}
+            if user in self.left:
+                self.left.discard(user)
+            else:
+                self.joined.add(user)
+        connections[channel] = expires_at
+
+    def remove(self, user, channel):
+        connections = self.members.get(user)
+        if connections is None or connections.pop(channel, None) is None:
+            return
+        if not connections:
+            del self.members[user]
+            if user in self.joined:
+                self.joined.discard(user)
+            else:
+                self.left.add(user)
+
+    def expire(self, now):
+        for user, connections in list(self.members.items()):
+            for channel, expires_at in list(connections.items()):
+                if expires_at <= now and channel not in self.local:
+                    self.remove(user, channel)
+
+    def beat_event(self):
+        return {
+            'type': 'presence.beat',
+            'source': self.listener_channel,
+            'members': [[consumer.user.username, channel]
+                        for channel, consumer in self.local.items()],
+        }
+
+    def snapshot(self):
+        return {'online': self.online, 'members': sorted(self.members)}
+
+    def take_diff(self):
+        if not self.joined and not self.left:
+            return None
+        diff = {'online': self.online,
+                'joined': sorted(self.joined),
+                'left': sorted(self.left)}
+        self.joined, self.left = set(), set()
+        return diff
+
+
+class PresenceTracker:
+    """
+    Presence for all rooms with sockets in this process. Other workers are
+    heard through one presence group per room (joined by a single channel
+    per process, not per socket); connections of a worker that died without
+    saying goodbye expire when its heartbeats stop.
+    """
+
+    def __init__(self):
+        self.rooms = {}
+        self.ticker = None
+
+    async def join(self, room_name, consumer):
+        room = self.rooms.get(room_name)
+        if room is None:
+            room = self.rooms[room_name] = RoomPresence(room_name)
+        channel, user = consumer.channel_name, consumer.user.username
+        room.local[channel] = consumer
+        room.add(user, channel, time.monotonic() + TIMEOUT)
+        if room.listener is None:
+            room.listener = asyncio.ensure_future(self.listen(room))
+        if self.ticker is None or self.ticker.done():
+            self.ticker = asyncio.ensure_future(self.tick())
+        await get_channel_layer().group_send(room.group, {
+            'type': 'presence.join', 'user': user, 'channel': channel})
+        if not room.synced.is_set():
+            # a room new to this process only knows its own sockets so far
+            try:
+                await asyncio.wait_for(room.synced.wait(), SYNC_TIMEOUT)
+            except asyncio.TimeoutError:
+                # no other worker has sockets in this room
+                room.synced.set()
+            # every local socket gets a snapshot now, so the diff is not needed
+            room.take_diff()
+        return room.snapshot()
+
+    async def leave(self, room_name, consumer):
+        room = self.rooms.get(room_name)
+        if room is None or room.local.pop(consumer.channel_name, None) is None:
+            return
+        channel, user = consumer.channel_name, consumer.user.username
+        room.remove(user, channel)
+        if not room.local:
+            # nobody here is watching the room any more
+            del self.rooms[room_name]
+            room.listener.cancel()
+        await get_channel_layer().group_send(room.group, {
+            'type': 'presence.leave', 'user': user, 'channel': channel})
+
+    async def listen(self, room):
+        """Apply presence events from all workers (this one included) to ``room``."""
+        layer = get_channel_layer()
+        channel = await layer.new_channel('presence')
+        await layer.group_add(room.group, channel)
+        room.listener_channel = channel
+        # ask the other workers for their members instead of waiting for their next beat
+        await layer.group_send(room.group, {'type': 'presence.sync', 'channel': channel})
+        try:
+            while True:
+                event = await layer.receive(channel)
+                expires_at = time.monotonic() + TIMEOUT
+                if event['type'] == 'presence.join':
+                    room.add(event['user'], event['channel'], expires_at)
+                elif event['type'] == 'presence.leave':
+                    room.remove(event['user'], event['channel'])
+                elif event['type'] == 'presence.beat':
+                    for user, channel_name in event['members']:
+                        room.add(user, channel_name, expires_at)
+                    if event.get('source') != channel:
+                        room.synced.set()
+                elif event['type'] == 'presence.sync' and event['channel'] != channel:
+                    await layer.send(event['channel'], room.beat_event())
+        finally:
+            await layer.group_discard(room.group, channel)
+
+    async def tick(self):
+        last_beat = time.monotonic()
+        while self.rooms:
+            await asyncio.sleep(DIFF_INTERVAL)
+            now = time.monotonic()
+            beat = now - last_beat >= HEARTBEAT_INTERVAL
+            if beat:
+                last_beat = now
+            for room in list(self.rooms.values()):
+                try:
+                    if beat:
+                        await self.beat(room, now)
+                    room.expire(now)
+                    await self.push_diff(room)
+                except Exception:
+                    logger.exception('Presence update failed for %s', room.name)
+
+    async def beat(self, room, now):
+        for consumer in list(room.local.values()):
+            if now - consumer.last_seen > TIMEOUT:
+                # socket vanished without a close frame, or its consumer died:
+                # forget it now rather than wait for a disconnect() that may never come
+                try:
+                    await consumer.close()
+                except Exception:
+                    pass
+                await self.leave(room.name, consumer)
+        if self.rooms.get(room.name) is not room:
+            # that was the last local socket
+            return
+        layer = get_channel_layer()
+        if room.listener_channel is not None:
+            # renew the listener's group membership before it can expire
+            await layer.group_add(room.group, room.listener_channel)
+        await layer.group_send(room.group, room.beat_event())
+
+    async def push_diff(self, room):
+        if not room.synced.is_set():
+            # local sockets are still waiting for their snapshot
+            return
+        diff = room.take_diff()
+        if diff is not None:
+            frame = frames.encode({'presence': diff})
+            for consumer in list(room.local.values()):
+                await consumer.send_encoded(frame)
+
+
+presence = PresenceTracker()
@@ -0,0 +1,88 @@
+import collections
+import time
+from django.conf import settings
+
+# messages per second and burst size, per user and per room, and history
+# requests per user; enforced in each worker process, so a room's effective
+# limit grows with the workers
+DEFAULT_RATE_LIMITS = {
+    'user': {'rate': 5, 'burst': 10},
+    'room': {'rate': 50, 'burst': 100},
+    'history': {'rate': 1, 'burst': 5},
+}
+# settings override single values, e.g. {'user': {'rate': 1}} keeps the default burst
+RATE_LIMITS = {scope: {**limits, **getattr(settings, 'CHAT_RATE_LIMITS', {}).get(scope, {})}
+               for scope, limits in DEFAULT_RATE_LIMITS.items()}
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.updated = now
+
+
+class RateLimiter:
+    """
+    Token buckets keyed by user or room. A bucket holds up to ``burst``
+    tokens and refills at ``rate`` tokens per second. At most ``max_keys``
+    buckets are kept: the least recently used one is evicted for a new key,
+    which only lets that key start again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets = collections.OrderedDict()
+
+    def refill(self, key, now):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                self.buckets.popitem(last=False)
+            bucket = self.buckets[key] = TokenBucket(self.burst, now)
+        else:
+            self.buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        return bucket
+
+    def retry_after(self, bucket):
+        return (1 - bucket.tokens) / self.rate
+
+
+user_limiter = RateLimiter(**RATE_LIMITS['user'])
+room_limiter = RateLimiter(**RATE_LIMITS['room'])
+history_limiter = RateLimiter(**RATE_LIMITS['history'])
+
+
+def check_message(user_id, room):
+    """
+    Take one token from both the user's and the room's bucket. Returns
+    ``None`` if the message may go out, or ``(scope, retry_after)`` if not;
+    a rejected message takes no token from either bucket.
+    """
+    now = time.monotonic()
+    user_bucket = user_limiter.refill(user_id, now)
+    if user_bucket.tokens < 1:
+        return 'user', user_limiter.retry_after(user_bucket)
+    room_bucket = room_limiter.refill(room, now)
+    if room_bucket.tokens < 1:
+        return 'room', room_limiter.retry_after(room_bucket)
+    user_bucket.tokens -= 1
+    room_bucket.tokens -= 1
+    return None
+
+
+def check_history(user_id):
+    """
+    Take one token from the user's history bucket (each request is a
+    database query). Returns ``None`` or the seconds to wait.
+    """
+    bucket = history_limiter.refill(user_id, time.monotonic())
+    if bucket.tokens < 1:
+        return history_limiter.retry_after(bucket)
+    bucket.tokens -= 1
+    return None
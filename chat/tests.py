@@ -1,3 +1,244 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase, mock
+import msgpack
+from channels.db import database_sync_to_async
+from channels.exceptions import ChannelFull
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from courses.models import Course, Subject
+from . import frames
+from .broker import HEADER
+from .consumers import ChatConsumer
+from .history import room_name
+from .layers import PROJECT_DIR, BrokerConnection, UnixSocketChannelLayer
+from .models import ChatPublisher, PublishedMessage, RoomSubscriber
+from .presence import TIMEOUT, PresenceTracker, RoomPresence, presence
+from .routing import websocket_urlpatterns
 
-# Create your tests here.
+
+class UnixSocketChannelLayerTests(IsolatedAsyncioTestCase):
+    """Runs the layer against a real broker process on a temporary socket."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.tmpdir, 'layer.sock')
+        config = UnixSocketChannelLayer(path=cls.path, expiry=1, capacity=2).broker_config
+        cls.broker = subprocess.Popen(
+            [sys.executable, '-m', 'chat.broker', cls.path, '--config', json.dumps(config)],
+            cwd=PROJECT_DIR, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+        deadline = time.monotonic() + 5
+        while not os.path.exists(cls.path):
+            if time.monotonic() > deadline or cls.broker.poll() is not None:
+                cls.tearDownClass()
+                raise RuntimeError('The chat broker did not start')
+            time.sleep(0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.broker.terminate()
+        cls.broker.wait(5)
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+        super().tearDownClass()
+
+    async def asyncSetUp(self):
+        self.layer = UnixSocketChannelLayer(path=self.path, expiry=1, capacity=2, autostart=False)
+        await self.layer.flush()
+
+    async def asyncTearDown(self):
+        await self.layer.close()
+
+    async def test_send_receive(self):
+        channel = await self.layer.new_channel()
+        await self.layer.send(channel, {'type': 'test.message', 'text': 'hi'})
+        message = await asyncio.wait_for(self.layer.receive(channel), 1)
+        self.assertEqual(message, {'type': 'test.message', 'text': 'hi'})
+
+    async def test_receive_waits_for_send(self):
+        channel = await self.layer.new_channel()
+        receive = asyncio.ensure_future(self.layer.receive(channel))
+        await asyncio.sleep(0.05)
+        self.assertFalse(receive.done())
+        await self.layer.send(channel, {'type': 'test.message'})
+        self.assertEqual(await asyncio.wait_for(receive, 1), {'type': 'test.message'})
+
+    async def test_group_send(self):
+        first, second = await self.layer.new_channel(), await self.layer.new_channel()
+        await self.layer.group_add('room', first)
+        await self.layer.group_add('room', second)
+        await self.layer.group_send('room', {'type': 'test.message', 'n': 1})
+        self.assertEqual((await asyncio.wait_for(self.layer.receive(first), 1))['n'], 1)
+        self.assertEqual((await asyncio.wait_for(self.layer.receive(second), 1))['n'], 1)
+        await self.layer.group_discard('room', first)
+        await self.layer.group_send('room', {'type': 'test.message', 'n': 2})
+        self.assertEqual((await asyncio.wait_for(self.layer.receive(second), 1))['n'], 2)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(self.layer.receive(first), 0.2)
+
+    async def test_message_expiry(self):
+        channel = await self.layer.new_channel()
+        await self.layer.send(channel, {'type': 'test.message'})
+        await asyncio.sleep(1.1)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(self.layer.receive(channel), 0.2)
+
+    async def test_channel_full(self):
+        channel = await self.layer.new_channel()
+        await self.layer.send(channel, {'type': 'test.message'})
+        await self.layer.send(channel, {'type': 'test.message'})
+        with self.assertRaises(ChannelFull):
+            await self.layer.send(channel, {'type': 'test.message'})
+
+    async def test_cancelled_receive_does_not_take_message(self):
+        channel = await self.layer.new_channel()
+        receive = asyncio.ensure_future(self.layer.receive(channel))
+        await asyncio.sleep(0.05)
+        receive.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await receive
+        await self.layer.send(channel, {'type': 'test.message'})
+        self.assertEqual(await asyncio.wait_for(self.layer.receive(channel), 1),
+                         {'type': 'test.message'})
+
+
+class BrokerConnectionTests(IsolatedAsyncioTestCase):
+
+    async def test_invalid_frame_fails_pending_requests(self):
+        client, server = socket.socketpair()
+        self.addCleanup(server.close)
+        reader, writer = await asyncio.open_unix_connection(sock=client)
+        connection = BrokerConnection(reader, writer)
+        _, future = connection.start('flush')
+        # 0xc1 is never used by msgpack
+        server.sendall(HEADER.pack(1) + b'\xc1')
+        with self.assertRaises(ConnectionError):
+            await asyncio.wait_for(future, 1)
+        await asyncio.sleep(0)
+        self.assertFalse(connection.alive)
+
+
+class FramesTests(SimpleTestCase):
+
+    def test_decode(self):
+        self.assertEqual(frames.decode('{"message": "hi"}'), {'message': 'hi'})
+        self.assertEqual(frames.decode(bytes_data=msgpack.packb({'message': 'hi'})),
+                         {'message': 'hi'})
+
+    def test_decode_rejects_malformed_frames(self):
+        for text_data in ('not json', '[1, 2]', '"hi"', 'null', '[' * 100000):
+            with self.assertRaises(frames.FrameError):
+                frames.decode(text_data)
+        for bytes_data in (b'\xc1', msgpack.packb([1, 2]), msgpack.packb({'a': 1}) + b'x'):
+            with self.assertRaises(frames.FrameError):
+                frames.decode(bytes_data=bytes_data)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ChatConsumerTests(TransactionTestCase):
+
+    def setUp(self):
+        # ids are reused after each flush: drop enrollment indexes of earlier tests
+        cache.clear()
+        self.user = User.objects.create_user('student', password='pw')
+        owner = User.objects.create_user('owner', password='pw')
+        subject = Subject.objects.create(title='Math', slug='math')
+        self.course = Course.objects.create(owner=owner, subject=subject, title='Course',
+                                            slug='course', overview='...')
+        self.course.students.add(self.user)
+        self.room = room_name(self.course.pk)
+        self.publisher = ChatPublisher.objects.create(name=self.room)
+        self.messages = [PublishedMessage.objects.create(publisher=self.publisher, user=owner,
+                                                         content=f'm{i}')
+                         for i in range(3)]
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns),
+                                             f'/ws/chat/room/{self.course.pk}/')
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive_frame(self, communicator, key):
+        """Next frame containing ``key``; frames sent together arrive as one list."""
+        while True:
+            data = json.loads(await communicator.receive_from(timeout=2))
+            for frame in data if isinstance(data, list) else [data]:
+                if key in frame:
+                    return frame
+
+    async def test_replay_reports_unread_and_moves_read_cursor(self):
+        communicator = await self.connect()
+        replay = await self.receive_frame(communicator, 'history')
+        self.assertEqual([message['message'] for message in replay['history']], ['m0', 'm1', 'm2'])
+        self.assertEqual(replay['unread'], 3)
+        subscriber = await database_sync_to_async(RoomSubscriber.objects.get)(user=self.user)
+        self.assertEqual(subscriber.last_read_id, self.messages[-1].pk)
+        await communicator.disconnect()
+
+        communicator = await self.connect()
+        replay = await self.receive_frame(communicator, 'history')
+        self.assertEqual(replay['unread'], 0)
+        await communicator.disconnect()
+
+    async def test_malformed_frames(self):
+        communicator = await self.connect()
+        await self.receive_frame(communicator, 'presence')
+        for frame in ('not json', '[1, 2]', '{"command": "nothing"}', '{"message": 1}'):
+            await communicator.send_to(text_data=frame)
+            self.assertIn('error', await self.receive_frame(communicator, 'error'))
+        # the socket is still in the room
+        await communicator.send_json_to({'message': 'hi'})
+        self.assertEqual((await self.receive_frame(communicator, 'message'))['message'], 'hi')
+        await communicator.disconnect()
+        self.assertNotIn(self.room, presence.rooms)
+
+    async def test_crashed_consumer_leaves_room(self):
+        communicator = await self.connect()
+        await self.receive_frame(communicator, 'presence')
+        self.assertIn(self.room, presence.rooms)
+        with mock.patch.object(ChatConsumer, 'read_history', side_effect=RuntimeError):
+            await communicator.send_json_to({'command': 'history'})
+            with self.assertRaises(RuntimeError):
+                await communicator.wait(timeout=2)
+        self.assertNotIn(self.room, presence.rooms)
+
+    def test_unread_annotation(self):
+        subscriber = RoomSubscriber.objects.create(user=self.user, publisher=self.publisher,
+                                                   last_read_id=self.messages[0].pk)
+        annotated = RoomSubscriber.objects.with_unread_count().get(pk=subscriber.pk)
+        self.assertEqual(annotated.unread, 2)
+        self.assertEqual(annotated.unread_count(), 2)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class PresenceTests(SimpleTestCase):
+
+    async def test_beat_forgets_dead_sockets(self):
+        async def close():
+            raise RuntimeError('application is gone')
+
+        tracker = PresenceTracker()
+        room = tracker.rooms['chat_1'] = RoomPresence('chat_1')
+        room.listener = asyncio.get_running_loop().create_future()
+        consumer = SimpleNamespace(channel_name='specific.dead', last_seen=0, close=close,
+                                   user=SimpleNamespace(username='student'))
+        room.local[consumer.channel_name] = consumer
+        room.add('student', consumer.channel_name, 0)
+        await tracker.beat(room, TIMEOUT + 1)
+        self.assertNotIn('chat_1', tracker.rooms)
+        self.assertEqual(room.online, 0)
+        self.assertTrue(room.listener.cancelled())
@@ -1,14 +1,39 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from courses.enrollment import is_enrolled
+from courses.models import Course
+from . import metrics
+from .history import get_history, mark_history_read, parse_history_params, room_name, subscribe
 
 
 @login_required
 def course_chat_room(request, course_id):
-    try:
-        # retrieve course with given id joined by the current user
-        course = request.user.courses_joined.get(id=course_id)
-    except:
+    if not is_enrolled(request.user, course_id):
         # user is not a student of the course or course does not exist
         return HttpResponseForbidden()
+    course = get_object_or_404(Course, id=course_id)
     return render(request, 'chat/room.html', {'course': course})
+
+
+@login_required
+def course_chat_history(request, course_id):
+    # ?before=<id> | ?after=<id> & limit=<n>; messages still in a worker's
+    # write-behind buffer show up after its next flush
+    if not is_enrolled(request.user, course_id):
+        return HttpResponseForbidden()
+    try:
+        params = parse_history_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    room = room_name(course_id)
+    history = get_history(room, **params)
+    mark_history_read(subscribe(room, request.user), history)
+    return JsonResponse(history)
+
+
+@staff_member_required
+def chat_metrics(request):
+    # counters and gauges of this worker process only
+    return JsonResponse(metrics.snapshot())
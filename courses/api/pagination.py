@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CourseCursorPagination(CursorPagination):
+    # keyset pagination: mỗi trang là một range scan trên index (created, id)
+    ordering = ('-created', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
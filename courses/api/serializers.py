@@ -44,10 +44,15 @@ class ModuleWithContentsSerializer(serializers.ModelSerializer):
         fields = ['order', 'title', 'description', 'contents']
 
 
-class CourseWithContentsSerializer(serializers.ModelSerializer):
-    modules = ModuleWithContentsSerializer(many=True)
-
+class CourseSummarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = ['id', 'subject', 'title', 'slug',
-                  'overview', 'created', 'owner', 'modules']
+                  'overview', 'created', 'owner']
+
+
+class CourseWithContentsSerializer(CourseSummarySerializer):
+    modules = ModuleWithContentsSerializer(many=True)
+
+    class Meta(CourseSummarySerializer.Meta):
+        fields = CourseSummarySerializer.Meta.fields + ['modules']
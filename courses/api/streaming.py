@@ -0,0 +1,34 @@
+from asgiref.sync import sync_to_async
+from rest_framework.renderers import JSONRenderer
+from courses.api.serializers import CourseSummarySerializer, ModuleWithContentsSerializer
+
+
+def stream_course_contents(course):
+    """
+    Sinh JSON của ``CourseWithContentsSerializer`` theo từng module, để
+    client nhận được phần đầu ngay và worker không phải giữ toàn bộ payload
+    trong bộ nhớ. ``course`` nên được nạp sẵn modules/contents/items.
+    """
+    renderer = JSONRenderer()
+    header = renderer.render(CourseSummarySerializer(course).data)
+    # bỏ dấu "}" cuối để nối thêm danh sách module
+    yield header[:-1] + b',"modules":['
+    for index, module in enumerate(course.modules.all()):
+        if index:
+            yield b','
+        yield renderer.render(ModuleWithContentsSerializer(module).data)
+    yield b']}'
+
+
+async def astream_course_contents(course):
+    """
+    Bản async của ``stream_course_contents`` cho ASGI: mỗi phần được render
+    trong thread sync qua ``sync_to_async``. Với một iterator sync, Django
+    dưới ASGI sẽ gom toàn bộ nội dung lại trước khi gửi.
+    """
+    chunks = stream_course_contents(course)
+    while True:
+        chunk = await sync_to_async(next)(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -13,5 +13,6 @@ router.register('courses', views.CourseViewSet)
 urlpatterns = [
     path('subjects/',views.SubjectListView.as_view(),name='subject_list'),
     path('subjects/<pk>/',views.SubjectDetailView.as_view(),name='subject_detail'),
+    path('search/', views.SearchView.as_view(), name='search'),
     path('', include(router.urls)),
 ]
@@ -1,4 +1,9 @@
+import codecs
+import io
 from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch, prefetch_related_objects
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework import viewsets
 from rest_framework.response import Response
@@ -6,10 +11,15 @@ from rest_framework import generics
 from rest_framework.authentication import BasicAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
-from courses.models import Subject, Course
+from courses.models import Subject, Course, Content
 from courses.api.serializers import SubjectSerializer, CourseSerializer
-from courses.api.permissions import IsEnrolled
+from courses.api.permissions import IsEnrolled, IsCourseOwner
+from courses.api.pagination import CourseCursorPagination
 from courses.api.serializers import CourseWithContentsSerializer
+from courses.api.streaming import astream_course_contents, stream_course_contents
+from courses.enrollment import bulk_enroll, get_enrolled_course_ids, read_identifiers
+from courses.conditional import get_not_modified_response, set_course_validators
+from courses.search import search
 
 
 
@@ -22,9 +32,32 @@ class SubjectDetailView(generics.RetrieveAPIView):
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
 
+class SearchView(APIView):
+    """
+    Tìm kiếm toàn văn: ``?q=<từ khóa>&page=<n>``. Mỗi kết quả là một khóa
+    học, module hoặc Text, kèm id khóa học và đoạn trích có đánh dấu. Module
+    và Text chỉ được tìm trong các khóa học người dùng đã ghi danh hoặc sở
+    hữu, giống quyền xem nội dung của ``contents``.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None):
+        try:
+            page = int(request.query_params.get('page', 1))
+        except ValueError:
+            return Response({'error': 'page phải là số nguyên.'}, status=400)
+        course_ids = get_enrolled_course_ids(request.user).union(
+            Course.objects.filter(owner=request.user).values_list('pk', flat=True))
+        results, has_next = search(request.query_params.get('q', ''), page, course_ids)
+        return Response({'results': results,
+                         'page': page,
+                         'next': page + 1 if has_next else None})
+
+
 class CourseViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    pagination_class = CourseCursorPagination
 
     @action(detail=True,
             methods=['post'],
@@ -35,10 +68,59 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
         course.students.add(request.user)
         return Response({'enrolled': True})
 
+    @action(detail=True,
+            methods=['post'],
+            url_path='bulk-enroll',
+            authentication_classes=[BasicAuthentication],
+            permission_classes=[IsAuthenticated, IsCourseOwner])
+    def bulk_enroll(self, request, *args, **kwargs):
+        """
+        Ghi danh hàng loạt. Body là CSV (``text/csv``, mỗi dòng một username
+        hoặc id) hoặc một mảng JSON; ``?by=id`` để tra cứu theo id.
+        """
+        course = self.get_object()
+        by = request.query_params.get('by', 'username')
+        format = 'csv' if request.content_type.startswith('text/csv') else 'json'
+        # đọc trực tiếp từ stream của request, không nạp toàn bộ body qua parser
+        stream = codecs.getreader('utf-8')(request.stream or io.BytesIO())
+        try:
+            counts = bulk_enroll(course, read_identifiers(stream, format), by=by)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response(counts)
+
     @action(detail=True,
             methods=['get'],
             serializer_class=CourseWithContentsSerializer,
             authentication_classes=[BasicAuthentication],
             permission_classes=[IsAuthenticated, IsEnrolled])
     def contents(self, request, *args, **kwargs):
-        return self.retrieve(request, *args, **kwargs)
+        course = self.get_object()
+        not_modified = get_not_modified_response(request, course)
+        if not_modified is not None:
+            return not_modified
+        # chỉ nạp cây module/content/item khi thực sự cần serialize
+        prefetch_related_objects([course], 'modules',
+                                 Prefetch('modules__contents',
+                                          queryset=Content.objects.with_items()))
+        if isinstance(request._request, ASGIRequest):
+            chunks = astream_course_contents(course)
+        else:
+            chunks = stream_course_contents(course)
+        response = StreamingHttpResponse(chunks, content_type='application/json')
+        return set_course_validators(response, course)
+
+    def retrieve(self, request, *args, **kwargs):
+        course = self.get_object()
+        not_modified = get_not_modified_response(request, course)
+        if not_modified is not None:
+            return not_modified
+        prefetch_related_objects([course], 'modules')
+        serializer = self.get_serializer(course)
+        return set_course_validators(Response(serializer.data), course)
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == 'list':
+            qs = qs.prefetch_related('modules')
+        return qs
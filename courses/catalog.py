@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from .models import Course, Module, Subject
+
+# Khóa cache chứa số phiên bản hiện tại của catalog. Mọi khóa dữ liệu
+# đều gắn số phiên bản này, nên chỉ cần tăng version là toàn bộ
+# catalog cũ bị bỏ qua mà không phải xóa từng khóa. Với cache riêng của
+# từng process (LocMemCache), version chỉ tăng trong process đã sửa dữ liệu,
+# nên thời hạn cache phải ngắn (xem CATALOG_CACHE_TIMEOUT trong settings).
+CATALOG_VERSION_KEY = 'catalog_version'
+CATALOG_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60)
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # khóa chưa tồn tại (cache mới khởi động hoặc đã bị xóa)
+        cache.add(CATALOG_VERSION_KEY, 1, None)
+
+
+def _catalog_key(name):
+    return f'catalog:{get_catalog_version()}:{name}'
+
+
+def get_subjects():
+    """
+    Danh sách Subject kèm số khóa học của cả cây con, dạng dict đã được
+    tính sẵn.
+    """
+    key = _catalog_key('subjects')
+    subjects = cache.get(key)
+    if subjects is None:
+        subjects = list(
+            Subject.objects.with_subtree_course_counts()
+                           .values('id', 'title', 'slug', 'path', 'depth',
+                                   'total_courses'))
+        cache.set(key, subjects, CATALOG_TIMEOUT)
+    return subjects
+
+
+def get_courses(subject=None):
+    """
+    Danh sách Course kèm số module. Nếu truyền ``subject`` (một dict từ
+    ``get_subjects``) thì chỉ lấy các khóa học trong cây con của subject đó.
+    """
+    key = _catalog_key(f'courses:{subject["id"] if subject else "all"}')
+    courses = cache.get(key)
+    if courses is None:
+        qs = Course.objects.annotate(total_modules=Count('modules'))
+        if subject:
+            qs = qs.filter(subject__path__startswith=subject['path'])
+        rows = qs.values('id', 'title', 'slug', 'total_modules',
+                         'subject__title', 'subject__slug',
+                         'owner__first_name', 'owner__last_name')
+        courses = [{
+            'id': row['id'],
+            'title': row['title'],
+            'slug': row['slug'],
+            'total_modules': row['total_modules'],
+            'subject': {'title': row['subject__title'],
+                        'slug': row['subject__slug']},
+            'owner_name': f"{row['owner__first_name']} "
+                          f"{row['owner__last_name']}".strip(),
+        } for row in rows]
+        cache.set(key, courses, CATALOG_TIMEOUT)
+    return courses
+
+
+def get_course_navigation(course):
+    """
+    Danh sách module (id, order, title) của một khóa học, dùng chung cho mọi
+    học viên. Khóa cache gắn với ``course.last_changed`` nên tự mất hiệu lực
+    khi module hoặc content thay đổi.
+    """
+    key = f'course_nav:{course.pk}:{course.last_changed.timestamp()}'
+    navigation = cache.get(key)
+    if navigation is None:
+        navigation = list(Module.objects.filter(course=course)
+                                        .values('id', 'order', 'title'))
+        cache.set(key, navigation, CATALOG_TIMEOUT)
+    return navigation
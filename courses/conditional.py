@@ -0,0 +1,20 @@
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def get_not_modified_response(request, course, *extra):
+    """
+    Trả về phản hồi 304 nếu client đã có phiên bản mới nhất của ``course``
+    (theo If-None-Match/If-Modified-Since), ngược lại trả về None.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(request,
+                                    etag=course.get_etag(*extra),
+                                    last_modified=int(course.last_changed.timestamp()))
+
+
+def set_course_validators(response, course, *extra):
+    response['ETag'] = course.get_etag(*extra)
+    response['Last-Modified'] = http_date(course.last_changed.timestamp())
+    return response
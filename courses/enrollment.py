@@ -0,0 +1,131 @@
+import asyncio
+import csv
+import json
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from .models import Course
+
+# Chỉ mục ghi danh: với mỗi người dùng, tập id các khóa học đã ghi danh
+# được giữ trong cache và bị xóa bởi m2m_changed trên Course.students,
+# nên phần lớn các lần kiểm tra không chạm tới bảng trung gian. Việc xóa
+# chỉ tới được các process khác khi cache dùng chung (REDIS_URL); với
+# LocMemCache thời hạn được giữ ngắn (xem ENROLLMENT_CACHE_TIMEOUT).
+ENROLLMENT_TIMEOUT = getattr(settings, 'ENROLLMENT_CACHE_TIMEOUT', 60)
+
+
+def _enrollment_key(user_id):
+    return f'enrolled_courses:{user_id}'
+
+
+def _load_enrolled_course_ids(user_id):
+    return frozenset(Course.students.through.objects.filter(user_id=user_id)
+                                                    .values_list('course_id', flat=True))
+
+
+def get_enrolled_course_ids(user):
+    if not user.is_authenticated:
+        return frozenset()
+    key = _enrollment_key(user.pk)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = _load_enrolled_course_ids(user.pk)
+        cache.set(key, course_ids, ENROLLMENT_TIMEOUT)
+    return course_ids
+
+
+def is_enrolled(user, course_id):
+    return int(course_id) in get_enrolled_course_ids(user)
+
+
+# các lần nạp đang chạy, theo user id: khi cache trống (ví dụ ngay sau khi
+# deploy) nhiều socket của cùng một người dùng kết nối lại cùng lúc chỉ
+# tốn một truy vấn
+_loading = {}
+
+
+async def _aload_enrolled_course_ids(user_id):
+    course_ids = await sync_to_async(_load_enrolled_course_ids)(user_id)
+    await cache.aset(_enrollment_key(user_id), course_ids, ENROLLMENT_TIMEOUT)
+    return course_ids
+
+
+async def ais_enrolled(user, course_id):
+    """Phiên bản async của ``is_enrolled`` dùng cho consumer."""
+    if not user.is_authenticated:
+        return False
+    course_ids = await cache.aget(_enrollment_key(user.pk))
+    if course_ids is None:
+        task = _loading.get(user.pk)
+        if task is None:
+            task = asyncio.ensure_future(_aload_enrolled_course_ids(user.pk))
+            _loading[user.pk] = task
+            task.add_done_callback(lambda t, user_id=user.pk: _loading.pop(user_id, None))
+        # shield: một socket bị hủy không được hủy lần nạp của các socket khác
+        course_ids = await asyncio.shield(task)
+    return int(course_id) in course_ids
+
+
+def invalidate_enrollments(user_ids):
+    cache.delete_many([_enrollment_key(user_id) for user_id in user_ids])
+
+
+def read_identifiers(stream, format='csv'):
+    """
+    Đọc lần lượt username/id từ một stream văn bản: CSV (cột đầu tiên,
+    bỏ qua dòng tiêu đề ``username``/``id``) hoặc một mảng JSON.
+    """
+    if format == 'json':
+        data = json.load(stream)
+        if not isinstance(data, list):
+            raise ValueError('Dữ liệu JSON phải là một mảng.')
+        for value in data:
+            yield str(value).strip()
+        return
+    for index, row in enumerate(csv.reader(stream)):
+        if not row or not row[0].strip():
+            continue
+        value = row[0].strip()
+        if index == 0 and value.lower() in ('username', 'id'):
+            continue
+        yield value
+
+
+def bulk_enroll(course, identifiers, by='username', batch_size=1000):
+    """
+    Ghi danh hàng loạt người dùng vào ``course``. Người dùng được tra cứu
+    theo lô, bỏ qua những người đã ghi danh, và các dòng của bảng trung gian
+    được chèn bằng ``bulk_create(ignore_conflicts=True)``.
+    Trả về số lượng theo từng trạng thái.
+    """
+    if by not in ('username', 'id'):
+        raise ValueError("by phải là 'username' hoặc 'id'.")
+    Enrollment = Course.students.through
+    counts = {'requested': 0, 'enrolled': 0, 'already_enrolled': 0, 'not_found': 0}
+    identifiers = iter(identifiers)
+    while True:
+        batch = set(islice(identifiers, batch_size))
+        if not batch:
+            break
+        requested = len(batch)
+        if by == 'id':
+            batch = {int(value) for value in batch if str(value).isdigit()}
+        user_ids = set(User.objects.filter(**{f'{by}__in': batch})
+                                   .values_list('pk', flat=True))
+        counts['requested'] += requested
+        counts['not_found'] += requested - len(user_ids)
+        with transaction.atomic():
+            existing = set(Enrollment.objects.filter(course_id=course.pk, user_id__in=user_ids)
+                                             .values_list('user_id', flat=True))
+            new_ids = user_ids - existing
+            Enrollment.objects.bulk_create(
+                [Enrollment(course_id=course.pk, user_id=user_id) for user_id in new_ids],
+                batch_size=batch_size, ignore_conflicts=True)
+        # bulk_create không phát m2m_changed nên phải tự cập nhật chỉ mục
+        invalidate_enrollments(new_ids)
+        counts['enrolled'] += len(new_ids)
+        counts['already_enrolled'] += len(existing)
+    return counts
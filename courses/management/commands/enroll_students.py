@@ -0,0 +1,40 @@
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from courses.enrollment import ENROLLMENT_TIMEOUT, bulk_enroll, read_identifiers
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Ghi danh hàng loạt người dùng (CSV hoặc mảng JSON username/id) vào một khóa học.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course', help='Slug của khóa học')
+        parser.add_argument('input', nargs='?', default='-', help='File đầu vào (mặc định: stdin)')
+        parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+        parser.add_argument('--by', choices=['username', 'id'], default='username')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(slug=options['course'])
+        except Course.DoesNotExist:
+            raise CommandError(f"Không tìm thấy khóa học '{options['course']}'.")
+        stream = sys.stdin if options['input'] == '-' else open(options['input'], encoding='utf-8', newline='')
+        try:
+            counts = bulk_enroll(course, read_identifiers(stream, options['format']),
+                                 by=options['by'], batch_size=options['batch_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(
+            'Yêu cầu {requested}: ghi danh mới {enrolled}, đã ghi danh {already_enrolled}, '
+            'không tìm thấy {not_found}.'.format(**counts)))
+        if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+            # chỉ mục ghi danh vừa bị xóa trong cache của process này, không
+            # phải của các server đang chạy
+            self.stdout.write(self.style.WARNING(
+                f'Cache không dùng chung (chưa đặt REDIS_URL): các server sẽ thấy '
+                f'ghi danh mới sau tối đa {ENROLLMENT_TIMEOUT} giây.'))
@@ -0,0 +1,74 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from courses.models import Course, Content
+from courses.transfer import item_fields
+
+
+class Command(BaseCommand):
+    help = 'Xuất một hoặc nhiều khóa học ra NDJSON (mỗi dòng một bản ghi).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='*', help='Slug của các khóa học cần xuất')
+        parser.add_argument('--all', action='store_true', help='Xuất toàn bộ khóa học')
+        parser.add_argument('-o', '--output', help='File đầu ra (mặc định: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options['all']:
+            courses = Course.objects.all()
+        elif options['slugs']:
+            courses = Course.objects.filter(slug__in=options['slugs'])
+        else:
+            raise CommandError('Cần truyền slug khóa học hoặc --all.')
+        courses = courses.select_related('owner', 'subject').order_by('pk')
+
+        out = open(options['output'], 'w', encoding='utf-8') if options['output'] else self.stdout
+        try:
+            total = 0
+            for course in courses.iterator(chunk_size=options['chunk_size']):
+                total += self.export_course(course, out, options['chunk_size'])
+        finally:
+            if options['output']:
+                out.close()
+        self.stderr.write(f'Đã xuất {total} bản ghi.')
+
+    def write(self, out, record):
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def export_course(self, course, out, chunk_size):
+        self.write(out, {
+            'type': 'course',
+            'slug': course.slug,
+            'title': course.title,
+            'overview': course.overview,
+            'owner': course.owner.username,
+            'subject': {'slug': course.subject.slug, 'title': course.subject.title},
+        })
+        count = 1
+        for module in course.modules.order_by('order', 'pk').iterator(chunk_size=chunk_size):
+            self.write(out, {
+                'type': 'module',
+                'key': module.pk,
+                'order': module.order,
+                'title': module.title,
+                'description': module.description,
+            })
+            count += 1
+        contents = Content.objects.filter(module__course=course) \
+                                  .order_by('module__order', 'module_id', 'order') \
+                                  .with_items()
+        for content in contents.iterator(chunk_size=chunk_size):
+            item = content.item
+            if item is None:
+                # content trỏ tới item đã bị xóa
+                continue
+            self.write(out, {
+                'type': 'content',
+                'module': content.module_id,
+                'order': content.order,
+                'item_type': item._meta.model_name,
+                'item': {field.name: field.value_to_string(item)
+                         for field in item_fields(type(item))},
+            })
+            count += 1
+        return count
@@ -0,0 +1,135 @@
+import json
+import sys
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from courses.catalog import bump_catalog_version
+from courses.search import index_course_tree
+from courses.models import Course, Module, Content, Subject
+from courses.transfer import ITEM_MODELS, item_fields
+
+
+class Command(BaseCommand):
+    help = 'Nhập khóa học từ NDJSON do export_course tạo ra, ghi theo lô bằng bulk_create.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-', help='File NDJSON (mặc định: stdin)')
+        parser.add_argument('--owner', help='Username của người sở hữu các khóa học được nhập')
+        parser.add_argument('--replace', action='store_true',
+                            help='Xóa khóa học trùng slug trước khi nhập')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.replace = options['replace']
+        self.owner = None
+        if options['owner']:
+            try:
+                self.owner = User.objects.get(username=options['owner'])
+            except User.DoesNotExist:
+                raise CommandError(f"Không tìm thấy người dùng '{options['owner']}'.")
+        self.content_types = {name: ContentType.objects.get_for_model(model)
+                              for name, model in ITEM_MODELS.items()}
+        self.counts = {'course': 0, 'module': 0, 'content': 0}
+
+        stream = sys.stdin if options['input'] == '-' else open(options['input'], encoding='utf-8')
+        try:
+            with transaction.atomic():
+                self.course = None
+                for lineno, line in enumerate(stream, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                        handler = getattr(self, f"handle_{record['type']}")
+                    except (ValueError, KeyError, AttributeError):
+                        raise CommandError(f'Dòng {lineno}: bản ghi không hợp lệ.')
+                    try:
+                        handler(record)
+                    except KeyError as e:
+                        # thiếu trường, hoặc item_type không được hỗ trợ
+                        raise CommandError(f'Dòng {lineno}: bản ghi không hợp lệ ({e}).')
+                self.flush()
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            'Đã nhập {course} khóa học, {module} module, {content} content.'.format(**self.counts)))
+
+    def handle_course(self, record):
+        self.flush()
+        owner = self.owner or User.objects.filter(username=record['owner']).first()
+        if owner is None:
+            raise CommandError(f"Không tìm thấy người dùng '{record['owner']}', hãy dùng --owner.")
+        subject, _ = Subject.objects.get_or_create(slug=record['subject']['slug'],
+                                                   defaults={'title': record['subject']['title']})
+        existing = Course.objects.filter(slug=record['slug'])
+        if existing.exists():
+            if not self.replace:
+                raise CommandError(f"Khóa học '{record['slug']}' đã tồn tại, hãy dùng --replace.")
+            existing.delete()
+        self.course = Course.objects.create(owner=owner, subject=subject, slug=record['slug'],
+                                            title=record['title'], overview=record['overview'])
+        self.modules = {}
+        self.pending_modules = []
+        self.pending_contents = []
+        self.counts['course'] += 1
+
+    def handle_module(self, record):
+        if self.course is None:
+            raise CommandError('Bản ghi module đứng trước bản ghi course.')
+        module = Module(course=self.course, order=record['order'],
+                        title=record['title'], description=record['description'])
+        self.pending_modules.append((record['key'], module))
+        if len(self.pending_modules) >= self.batch_size:
+            self.flush_modules()
+
+    def handle_content(self, record):
+        if self.course is None:
+            raise CommandError('Bản ghi content đứng trước bản ghi course.')
+        model = ITEM_MODELS[record['item_type']]
+        item = model(owner=self.course.owner, **{
+            field.name: field.to_python(record['item'][field.name])
+            for field in item_fields(model) if field.name in record['item']})
+        self.pending_contents.append((record['module'], record['order'], item))
+        if len(self.pending_contents) >= self.batch_size:
+            self.flush_contents()
+
+    def flush(self):
+        if self.course is not None:
+            self.flush_modules()
+            self.flush_contents()
+            # bulk_create không phát signal nên index tìm kiếm phải cập nhật tay
+            index_course_tree(self.course)
+
+    def flush_modules(self):
+        if not self.pending_modules:
+            return
+        Module.objects.bulk_create([module for _, module in self.pending_modules])
+        for key, module in self.pending_modules:
+            self.modules[key] = module
+        self.counts['module'] += len(self.pending_modules)
+        self.pending_modules = []
+
+    def flush_contents(self):
+        if not self.pending_contents:
+            return
+        # module phải có id trước khi tạo content trỏ tới nó
+        self.flush_modules()
+        by_model = {}
+        for _, _, item in self.pending_contents:
+            by_model.setdefault(type(item), []).append(item)
+        for model, items in by_model.items():
+            model.objects.bulk_create(items, batch_size=self.batch_size)
+        try:
+            contents = [Content(module=self.modules[module_key], order=order,
+                                content_type=self.content_types[item._meta.model_name],
+                                object_id=item.pk)
+                        for module_key, order, item in self.pending_contents]
+        except KeyError as e:
+            raise CommandError(f'Content trỏ tới module không tồn tại: {e}')
+        Content.objects.bulk_create(contents, batch_size=self.batch_size)
+        self.counts['content'] += len(contents)
+        self.pending_contents = []
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from courses.search import is_supported, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Dựng lại chỉ mục tìm kiếm toàn văn cho khóa học, module và Text.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Số khóa học xử lý mỗi lô.')
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            self.stdout.write(self.style.WARNING('CSDL hiện tại không hỗ trợ FTS5, bỏ qua.'))
+            return
+        total = rebuild_index(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Đã đánh index {total} tài liệu.'))
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_subject_paths(apps, schema_editor):
+    Subject = apps.get_model('courses', 'Subject')
+    subjects = {s.pk: s for s in Subject.objects.all()}
+
+    def build(subject):
+        if not subject.path:
+            if subject.parent_id:
+                parent = build(subjects[subject.parent_id])
+                subject.path = f'{parent.path}{subject.pk}/'
+                subject.depth = parent.depth + 1
+            else:
+                subject.path = f'{subject.pk}/'
+                subject.depth = 0
+        return subject
+
+    for subject in subjects.values():
+        build(subject)
+    Subject.objects.bulk_update(subjects.values(), ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('courses', '0004_course_students'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subject',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='subsubjects', to='courses.subject'),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='content',
+            name='content_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype'),
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='title',
+            field=models.CharField(max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='file',
+            field=models.ImageField(upload_to='images'),
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='title',
+            field=models.CharField(max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='text',
+            name='title',
+            field=models.CharField(max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='title',
+            field=models.CharField(max_length=200),
+        ),
+        migrations.RunPython(build_subject_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_subject_tree'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['-created', 'id'], name='courses_cou_created_112d71_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_course_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='last_changed',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'courses_searchindex'
+DOC_KINDS = 3  # course, module, text -> rowid = pk * 3 + loại
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 chỉ có trên SQLite; CSDL khác dùng truy vấn icontains dự phòng
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        f"kind UNINDEXED, object_id UNINDEXED, course_id UNINDEXED, title, body, "
+        f"tokenize = 'unicode61 remove_diacritics 2')")
+    schema_editor.execute(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, course_id, title, body) "
+        f"SELECT id * {DOC_KINDS}, 'course', id, id, title, overview FROM courses_course")
+    schema_editor.execute(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, course_id, title, body) "
+        f"SELECT id * {DOC_KINDS} + 1, 'module', id, course_id, title, description "
+        f"FROM courses_module")
+    schema_editor.execute(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, course_id, title, body) "
+        f"SELECT t.id * {DOC_KINDS} + 2, 'text', t.id, MIN(m.course_id), t.title, t.content "
+        f"FROM courses_text t "
+        f"JOIN courses_content c ON c.object_id = t.id "
+        f"JOIN django_content_type ct ON ct.id = c.content_type_id "
+        f"AND ct.app_label = 'courses' AND ct.model = 'text' "
+        f"JOIN courses_module m ON m.id = c.module_id "
+        f"GROUP BY t.id")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('courses', '0007_course_last_changed'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,9 +1,14 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Func, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Substr
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.core.cache import cache
 from django.template.loader import render_to_string
-from .fields import OrderField
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from .fields import OrderField, OrderedModelMixin, OrderedQuerySet
 
 class Component:
     @property
@@ -19,10 +24,28 @@ class Component:
     def is_composite(self):
         return False
 
+class SubjectQuerySet(models.QuerySet):
+    def with_subtree_course_counts(self):
+        """
+        Gắn ``total_courses`` = số khóa học trong toàn bộ cây con của mỗi
+        subject (tính bằng subquery trên materialized path).
+        """
+        subtree_courses = Course.objects.filter(
+            subject__path__startswith=OuterRef('path')
+        ).order_by().annotate(total=Func('pk', function='COUNT')).values('total')
+        return self.annotate(total_courses=Coalesce(Subquery(subtree_courses), 0))
+
+
 class Subject(models.Model, Component):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     parent = models.ForeignKey('self', null=True, blank=True, related_name='subsubjects', on_delete=models.CASCADE)
+    # Materialized path: chuỗi id từ gốc tới node, ví dụ "1/5/12/".
+    # Cho phép lấy cả cây con bằng một truy vấn ``path LIKE '1/5/%'``.
+    path = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+    depth = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = SubjectQuerySet.as_manager()
 
     class Meta:
         ordering = ['title']
@@ -30,13 +53,77 @@ class Subject(models.Model, Component):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if self.parent_id and self.path and self.parent.path.startswith(self.path):
+            raise ValueError('Không thể đặt subject con làm parent của chính nó.')
+        # path của cả cây con được ghi trong cùng transaction, nên cache
+        # catalog (bump sau commit) không bao giờ thấy path cũ
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.update_path()
+
+    def update_path(self):
+        """
+        Tính lại path/depth của subject này và cập nhật path của toàn bộ
+        cây con (nếu subject được chuyển sang parent khác) bằng một lệnh UPDATE.
+        """
+        if self.parent_id:
+            parent = Subject.objects.only('path', 'depth').get(pk=self.parent_id)
+            path, depth = f'{parent.path}{self.pk}/', parent.depth + 1
+        else:
+            path, depth = f'{self.pk}/', 0
+        old_path, old_depth = self.path, self.depth
+        if path == old_path and depth == old_depth:
+            return
+        Subject.objects.filter(pk=self.pk).update(path=path, depth=depth)
+        if old_path:
+            Subject.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (depth - old_depth))
+        self.path, self.depth = path, depth
+
+    def get_descendants(self, include_self=False):
+        # Tất cả subject trong cây con, một truy vấn duy nhất
+        qs = Subject.objects.filter(path__startswith=self.path)
+        if not include_self:
+            qs = qs.exclude(pk=self.pk)
+        return qs
+
+    def get_subtree_courses(self):
+        # Tất cả khóa học thuộc subject này hoặc bất kỳ subject con nào
+        return Course.objects.filter(subject__path__startswith=self.path)
+
+    def get_subtree_course_count(self):
+        return self.get_subtree_courses().count()
+
+    def load_subtree(self):
+        """
+        Nạp toàn bộ cây con (subject và course) bằng hai truy vấn và gắn
+        vào từng node, để ``children``/``is_composite`` không truy vấn thêm.
+        """
+        nodes = {self.pk: self}
+        for subject in self.get_descendants().order_by('depth', 'title'):
+            nodes[subject.pk] = subject
+        for node in nodes.values():
+            node._tree_subjects, node._tree_courses = [], []
+        for node in sorted(nodes.values(), key=lambda n: (n.depth, n.title)):
+            if node.pk != self.pk and node.parent_id in nodes:
+                nodes[node.parent_id]._tree_subjects.append(node)
+        for course in self.get_subtree_courses():
+            nodes[course.subject_id]._tree_courses.append(course)
+        return self
+
     @property
     def children(self):
         # Trả về các môn học con (sub-subjects) và các khóa học thuộc môn học này
+        if hasattr(self, '_tree_subjects'):
+            return self._tree_subjects + self._tree_courses
         return list(self.subsubjects.all()) + list(self.courses.all())
 
     def is_composite(self):
         # Subject là composite nếu có sub-subject hoặc course
+        if hasattr(self, '_tree_subjects'):
+            return bool(self._tree_subjects or self._tree_courses)
         return self.subsubjects.exists() or self.courses.exists()
 
     def add(self, child):
@@ -62,14 +149,33 @@ class Course(models.Model, Component):
     slug = models.SlugField(max_length=200, unique=True)
     overview = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    # Thời điểm thay đổi gần nhất của khóa học hoặc module/content/item bên
+    # trong, được cập nhật qua signal. Dùng làm validator cho ETag/Last-Modified.
+    last_changed = models.DateTimeField(default=timezone.now, editable=False)
     students = models.ManyToManyField(User, related_name='courses_joined', blank=True)
 
     class Meta:
         ordering = ['-created']
+        indexes = [models.Index(fields=['-created', 'id'])]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.last_changed = timezone.now()
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def touch(**lookup):
+        """Đánh dấu các khóa học khớp ``lookup`` là vừa thay đổi (một lệnh UPDATE)."""
+        Course.objects.filter(**lookup).update(last_changed=timezone.now())
+
+    def get_etag(self, *extra):
+        # ``extra``: các yếu tố khác làm thay đổi nội dung phản hồi (vd: trạng thái đăng nhập)
+        parts = [str(self.pk), str(int(self.last_changed.timestamp() * 1000000))]
+        parts.extend(str(value) for value in extra)
+        return '"{}"'.format('-'.join(parts))
+
     @property
     def children(self):
         """
@@ -102,12 +208,14 @@ class Course(models.Model, Component):
         """
         return self.modules.all()
 
-class Module(models.Model, Component):
+class Module(OrderedModelMixin, models.Model, Component):
     course = models.ForeignKey(Course, related_name='modules', on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     order = OrderField(blank=True, for_fields=['course'])
 
+    objects = OrderedQuerySet.as_manager()
+
     class Meta:
         ordering = ['order']
 
@@ -146,12 +254,25 @@ class Module(models.Model, Component):
         """
         return self.contents.all()
 
-class Content(models.Model, Component):
+class ContentQuerySet(OrderedQuerySet):
+    def with_items(self):
+        """
+        Nạp ``item`` của các content theo lô: gom các dòng theo
+        ``content_type`` và lấy Text/File/Image/Video bằng một truy vấn
+        cho mỗi loại, thay vì một truy vấn cho mỗi content.
+        """
+        return self.prefetch_related('item')
+
+
+class Content(OrderedModelMixin, models.Model, Component):
     module = models.ForeignKey(Module, related_name='contents', on_delete=models.CASCADE)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     item = GenericForeignKey('content_type', 'object_id')
     order = OrderField(blank=True, for_fields=['module'])
+
+    objects = ContentQuerySet.as_manager()
+
     class Meta:
         ordering = ['order']
     @property
@@ -163,6 +284,10 @@ class Content(models.Model, Component):
     def is_composite(self):
         return bool(self.children)
 
+# Thời gian giữ HTML đã render của một item trong cache
+ITEM_HTML_TIMEOUT = 60 * 60 * 24
+
+
 class ItemBase(models.Model, Component):
     owner = models.ForeignKey(User, related_name='%(class)s_related', on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
@@ -175,9 +300,23 @@ class ItemBase(models.Model, Component):
     def __str__(self):
         return self.title
 
-    def render(self):
+    def render_cache_key(self):
+        # updated thay đổi mỗi lần lưu nên HTML cũ không bao giờ bị dùng lại
+        return f'item_html:{self._meta.model_name}:{self.pk}:{self.updated.timestamp()}'
+
+    def render_html(self):
         return render_to_string(f'courses/content/{self._meta.model_name}.html', {'item': self})
 
+    def render(self):
+        if self.pk is None or self.updated is None:
+            return self.render_html()
+        key = self.render_cache_key()
+        html = cache.get(key)
+        if html is None:
+            html = self.render_html()
+            cache.set(key, html, ITEM_HTML_TIMEOUT)
+        return mark_safe(html)
+
 # Concrete item classes
 class Text(ItemBase):
     content = models.TextField()
@@ -0,0 +1,179 @@
+import html
+import re
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from .models import Course, Module, Content, Text
+
+# Bảng ảo FTS5 (tạo trong migration 0008). Mỗi tài liệu là một khóa học,
+# một module hoặc một Text; rowid được suy ra từ (pk, loại) nên cập nhật
+# hay xóa một tài liệu chỉ tốn một lần tra rowid.
+SEARCH_TABLE = 'courses_searchindex'
+DOC_KINDS = ('course', 'module', 'text')
+SEARCH_PAGE_SIZE = 20
+# không cho phép lật quá sâu: OFFSET lớn vẫn phải xếp hạng toàn bộ kết quả
+SEARCH_MAX_PAGE = 50
+SNIPPET_TOKENS = 16
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def _rowid(kind, pk):
+    return pk * len(DOC_KINDS) + DOC_KINDS.index(kind)
+
+
+def _write(docs):
+    """Ghi đè các tài liệu ``(kind, pk, course_id, title, body)``."""
+    if not docs or not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+                           [(_rowid(kind, pk),) for kind, pk, *_ in docs])
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} '
+            f'(rowid, kind, object_id, course_id, title, body) '
+            f'VALUES (%s, %s, %s, %s, %s, %s)',
+            [(_rowid(kind, pk), kind, pk, course_id, title, body or '')
+             for kind, pk, course_id, title, body in docs])
+
+
+def remove(kind, pk):
+    if is_supported():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+                           [_rowid(kind, pk)])
+
+
+def _course_doc(course):
+    return ('course', course.pk, course.pk, course.title, course.overview)
+
+
+def _module_doc(module):
+    return ('module', module.pk, module.course_id, module.title, module.description)
+
+
+def _text_doc(text, course_id):
+    return ('text', text.pk, course_id, text.title, text.content)
+
+
+def index_course(course):
+    _write([_course_doc(course)])
+
+
+def index_module(module):
+    _write([_module_doc(module)])
+
+
+def index_text(text, course_id=None):
+    """
+    Đánh index một Text. ``course_id`` được tra qua Content nếu không truyền;
+    Text chưa được gắn vào module nào thì chưa có gì để tìm.
+    """
+    if course_id is None:
+        course_id = Content.objects.filter(
+            content_type=ContentType.objects.get_for_model(Text),
+            object_id=text.pk).values_list('module__course_id', flat=True).first()
+    if course_id is not None:
+        _write([_text_doc(text, course_id)])
+
+
+def _text_docs(contents):
+    text_type = ContentType.objects.get_for_model(Text)
+    rows = contents.filter(content_type=text_type) \
+                   .values_list('object_id', 'module__course_id')
+    course_ids = dict(rows)
+    return [_text_doc(text, course_ids[text.pk])
+            for text in Text.objects.filter(pk__in=course_ids)]
+
+
+def index_course_tree(course):
+    """Đánh index lại một khóa học cùng module và Text của nó (dùng sau bulk_create)."""
+    docs = [_course_doc(course)]
+    docs += [_module_doc(module) for module in course.modules.all()]
+    docs += _text_docs(Content.objects.filter(module__course=course))
+    _write(docs)
+
+
+def rebuild_index(batch_size=1000):
+    """Xóa và dựng lại toàn bộ index, theo từng lô ``batch_size`` khóa học."""
+    if not is_supported():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+    total = 0
+    courses = Course.objects.order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(courses.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return total
+        docs = [_course_doc(course) for course in batch]
+        docs += [_module_doc(module) for module in Module.objects.filter(course__in=batch)]
+        docs += _text_docs(Content.objects.filter(module__course__in=batch))
+        _write(docs)
+        total += len(docs)
+        last_pk = batch[-1].pk
+
+
+def build_match(query):
+    """
+    Chuyển chuỗi người dùng nhập thành biểu thức MATCH an toàn: mỗi từ được
+    đặt trong ngoặc kép (không lộ cú pháp FTS5) và so khớp theo tiền tố.
+    """
+    terms = re.findall(r'\w+', query.lower())[:10]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _highlight(snippet):
+    # FTS5 đánh dấu bằng ký tự điều khiển; escape trước rồi mới thay bằng thẻ
+    return html.escape(snippet).replace('\x02', '<mark>').replace('\x03', '</mark>')
+
+
+def search(query, page=1, course_ids=()):
+    """
+    Tìm kiếm toàn văn trên khóa học, module và Text. Khóa học là công khai;
+    module và Text chỉ được trả về nếu thuộc một khóa học trong
+    ``course_ids`` (các khóa người dùng đã ghi danh hoặc sở hữu). Trả về
+    ``(kết quả, có trang sau hay không)``; kết quả xếp theo bm25, tiêu đề
+    có trọng số cao hơn nội dung.
+    """
+    match = build_match(query)
+    if not match or not 1 <= page <= SEARCH_MAX_PAGE:
+        return [], False
+    course_ids = list(course_ids)
+    if not is_supported():
+        return _search_fallback(query, page, course_ids)
+    offset = (page - 1) * SEARCH_PAGE_SIZE
+    visible = "kind = 'course'"
+    if course_ids:
+        visible += f" OR course_id IN ({', '.join(['%s'] * len(course_ids))})"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT kind, object_id, course_id, title, "
+            f"snippet({SEARCH_TABLE}, 4, char(2), char(3), '…', {SNIPPET_TOKENS}) "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND ({visible}) "
+            f"ORDER BY bm25({SEARCH_TABLE}, 0, 0, 0, 5.0, 1.0) "
+            f"LIMIT %s OFFSET %s",
+            [match, *course_ids, SEARCH_PAGE_SIZE + 1, offset])
+        rows = cursor.fetchall()
+    results = [{'type': kind, 'id': pk, 'course': course_id,
+                'title': title, 'snippet': _highlight(snippet)}
+               for kind, pk, course_id, title, snippet in rows[:SEARCH_PAGE_SIZE]]
+    return results, len(rows) > SEARCH_PAGE_SIZE and page < SEARCH_MAX_PAGE
+
+
+def _search_fallback(query, page, course_ids):
+    # CSDL không có FTS5: quét icontains, chỉ để chức năng vẫn dùng được
+    query = query.strip()
+    docs = [_course_doc(c) for c in Course.objects.filter(title__icontains=query)]
+    docs += [_module_doc(m) for m in Module.objects.filter(title__icontains=query,
+                                                           course_id__in=course_ids)]
+    docs += _text_docs(Content.objects.filter(
+        module__course_id__in=course_ids,
+        object_id__in=Text.objects.filter(content__icontains=query).values('pk')))
+    start = (page - 1) * SEARCH_PAGE_SIZE
+    results = [{'type': kind, 'id': pk, 'course': course_id, 'title': title,
+                'snippet': html.escape((body or '')[:200])}
+               for kind, pk, course_id, title, body in docs[start:start + SEARCH_PAGE_SIZE]]
+    return results, len(docs) > start + SEARCH_PAGE_SIZE and page < SEARCH_MAX_PAGE
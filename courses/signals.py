@@ -0,0 +1,146 @@
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from .catalog import bump_catalog_version
+from .enrollment import invalidate_enrollments
+from . import search
+from .models import Course, Module, Content, Subject, ITEM_HTML_TIMEOUT, Text, File, Image, Video
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def invalidate_catalog(sender, **kwargs):
+    # catalog (số khóa học, số module) thay đổi -> bỏ toàn bộ cache cũ,
+    # sau khi transaction commit (Subject.save còn cập nhật path sau post_save)
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Subject)
+def update_subject_path(sender, instance, raw=False, **kwargs):
+    # loaddata lưu ở chế độ raw, không gọi Subject.save()
+    if raw:
+        instance.update_path()
+
+
+def forget_item_html(sender, instance, raw=False, **kwargs):
+    # xóa HTML của phiên bản cũ trước khi ``updated`` được cập nhật
+    if not raw and instance.pk and instance.updated:
+        cache.delete(instance.render_cache_key())
+
+
+def cache_item_html(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache.set(instance.render_cache_key(), instance.render_html(), ITEM_HTML_TIMEOUT)
+
+
+# --- Course.last_changed: mọi thay đổi bên trong khóa học làm mới validator ---
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def touch_module_course(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Course.touch(pk=instance.course_id)
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def touch_content_course(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Course.touch(modules=instance.module_id)
+
+
+@receiver(post_save, sender=Subject)
+def touch_subject_courses(sender, instance, raw=False, **kwargs):
+    # trang chi tiết khóa học hiển thị tiêu đề và slug của subject
+    if not raw:
+        Course.touch(subject=instance)
+
+
+@receiver(post_save, sender=User)
+def touch_owned_courses(sender, instance, raw=False, update_fields=None, **kwargs):
+    # ... và tên giảng viên; bỏ qua các lần lưu không đổi tên (vd: last_login khi đăng nhập)
+    if raw or (update_fields is not None
+               and not {'first_name', 'last_name'} & set(update_fields)):
+        return
+    Course.touch(owner=instance)
+
+
+def touch_item_courses(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Course.touch(modules__contents__content_type=ContentType.objects.get_for_model(sender),
+                     modules__contents__object_id=instance.pk)
+
+
+for item_model in (Text, File, Image, Video):
+    pre_save.connect(forget_item_html, sender=item_model)
+    post_save.connect(cache_item_html, sender=item_model)
+    post_delete.connect(forget_item_html, sender=item_model)
+    post_save.connect(touch_item_courses, sender=item_model)
+    post_delete.connect(touch_item_courses, sender=item_model)
+
+
+# --- Chỉ mục ghi danh ---
+@receiver(m2m_changed, sender=Course.students.through)
+def update_enrollment_index(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        # sau khi clear sẽ không còn biết những học viên nào bị ảnh hưởng
+        instance._cleared_student_ids = list(instance.students.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        user_ids = [instance.pk]
+    elif action == 'post_clear':
+        user_ids = getattr(instance, '_cleared_student_ids', [])
+    else:
+        user_ids = pk_set
+    invalidate_enrollments(user_ids)
+
+
+@receiver(pre_delete, sender=Course)
+def forget_course_enrollments(sender, instance, **kwargs):
+    invalidate_enrollments(instance.students.values_list('pk', flat=True))
+
+
+# --- Chỉ mục tìm kiếm toàn văn ---
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_course(instance)
+
+
+@receiver(post_save, sender=Module)
+def index_module(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_module(instance)
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Text)
+def remove_search_document(sender, instance, **kwargs):
+    search.remove(sender._meta.model_name, instance.pk)
+
+
+@receiver(post_save, sender=Text)
+def index_text(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_text(instance)
+
+
+@receiver(post_save, sender=Content)
+def index_content_text(sender, instance, raw=False, **kwargs):
+    # Text thường được lưu trước khi gắn vào module, nên index lại khi có Content
+    if not raw and instance.content_type.model_class() is Text:
+        search.index_text(instance.item, instance.module.course_id)
+
+
+@receiver(post_delete, sender=Content)
+def remove_content_text(sender, instance, **kwargs):
+    if instance.content_type.model_class() is Text:
+        search.remove('text', instance.object_id)
@@ -1,3 +1,143 @@
-from django.test import TestCase
+import json
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import Content, Course, Module, Subject, Text
 
-# Create your tests here.
+
+class CourseTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='pw')
+        cls.other = User.objects.create_user('other', password='pw')
+        cls.subject = Subject.objects.create(title='Math', slug='math')
+        cls.course = Course.objects.create(owner=cls.owner, subject=cls.subject,
+                                           title='Course', slug='course', overview='...')
+        cls.other_course = Course.objects.create(owner=cls.other, subject=cls.subject,
+                                                 title='Other', slug='other', overview='...')
+
+
+class ModuleOrderViewTests(CourseTestMixin, TestCase):
+    """Sắp xếp lại module: hoặc áp dụng tất cả, hoặc trả về 400 và không ghi gì."""
+
+    def setUp(self):
+        self.modules = [Module.objects.create(course=self.course, title=f'M{i}')
+                        for i in range(3)]
+        self.foreign = Module.objects.create(course=self.other_course, title='Foreign')
+        self.client.login(username='owner', password='pw')
+
+    def post_order(self, body):
+        return self.client.post(reverse('module_order'), data=body,
+                                content_type='application/json')
+
+    def orders(self):
+        return list(Module.objects.filter(course=self.course)
+                                  .order_by('pk').values_list('order', flat=True))
+
+    def test_reorder(self):
+        a, b, c = self.modules
+        response = self.post_order(json.dumps({a.pk: 2, b.pk: 0, c.pk: 1}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.orders(), [2, 0, 1])
+
+    def test_duplicate_ids(self):
+        a, b, _ = self.modules
+        for body in (f'{{"{a.pk}": 2, "{a.pk}": 1, "{b.pk}": 0}}',
+                     f'{{"{a.pk}": 2, "0{a.pk}": 1, "{b.pk}": 0}}'):
+            self.assertEqual(self.post_order(body).status_code, 400)
+        self.assertEqual(self.orders(), [0, 1, 2])
+
+    def test_foreign_ids(self):
+        a, _, _ = self.modules
+        response = self.post_order(json.dumps({a.pk: 2, self.foreign.pk: 0}))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.orders(), [0, 1, 2])
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.order, 0)
+
+    def test_missing_ids(self):
+        a, _, _ = self.modules
+        missing = Module.objects.order_by('-pk').first().pk + 1
+        response = self.post_order(json.dumps({a.pk: 2, missing: 0}))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.orders(), [0, 1, 2])
+
+    def test_invalid_orders(self):
+        a, _, _ = self.modules
+        for body in (json.dumps({a.pk: -1}), json.dumps({a.pk: 'x'}),
+                     json.dumps([a.pk]), 'not json'):
+            self.assertEqual(self.post_order(body).status_code, 400)
+        self.assertEqual(self.orders(), [0, 1, 2])
+
+
+class OrderFieldTests(CourseTestMixin, TestCase):
+    """Gán thứ tự tự động cho module/content chưa có ``order``."""
+
+    def test_sibling_inserts(self):
+        first = Module.objects.create(course=self.course, title='A')
+        second = Module.objects.create(course=self.course, title='B')
+        other = Module.objects.create(course=self.other_course, title='C')
+        self.assertEqual((first.order, second.order), (0, 1))
+        # mỗi khóa học có dãy thứ tự riêng
+        self.assertEqual(other.order, 0)
+
+    def test_explicit_order_is_kept(self):
+        Module.objects.create(course=self.course, title='A', order=5)
+        module = Module.objects.create(course=self.course, title='B')
+        self.assertEqual(module.order, 6)
+
+    def test_bulk_create(self):
+        Module.objects.create(course=self.course, title='Existing')
+        modules = Module.objects.bulk_create([
+            Module(course=self.course, title='A'),
+            Module(course=self.other_course, title='B'),
+            Module(course=self.course, title='C', order=10),
+            Module(course=self.course, title='D'),
+        ])
+        self.assertEqual([module.order for module in modules], [1, 0, 10, 2])
+
+    def test_bulk_create_contents(self):
+        module = Module.objects.create(course=self.course, title='M')
+        texts = [Text.objects.create(owner=self.owner, title=f'T{i}', content='...')
+                 for i in range(3)]
+        contents = Content.objects.bulk_create([Content(module=module, item=text)
+                                                for text in texts])
+        self.assertEqual([content.order for content in contents], [0, 1, 2])
+
+
+class OrderFieldTransactionTests(CourseTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        # TransactionTestCase xóa dữ liệu sau mỗi test và không gọi setUpTestData
+        self.setUpTestData()
+
+    def test_reservation_and_insert_share_a_transaction(self):
+        # ở chế độ autocommit, khóa của reserve() phải được giữ tới sau INSERT
+        with CaptureQueriesContext(connection) as queries:
+            Module.objects.create(course=self.course, title='A')
+        sql = [query['sql'].split()[0].upper() for query in queries.captured_queries]
+        self.assertIn('BEGIN', sql)
+        self.assertLess(sql.index('BEGIN'), sql.index('SELECT'))
+        self.assertLess(sql.index('INSERT'), sql.index('COMMIT'))
+
+
+class CourseDetailViewTests(CourseTestMixin, TestCase):
+
+    def setUp(self):
+        self.url = reverse('course_detail', args=[self.course.slug])
+
+    def test_anonymous_revalidation(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_authenticated_page_is_never_not_modified(self):
+        # trang có csrf_token của phiên: không được dùng lại qua 304
+        self.client.login(username='other', password='pw')
+        etag = self.course.get_etag()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIn('private', response['Cache-Control'])
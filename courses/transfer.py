@@ -0,0 +1,26 @@
+"""
+Định dạng NDJSON dùng để chuyển khóa học giữa các môi trường
+(xem các lệnh ``export_course`` và ``import_course``).
+
+Mỗi dòng là một object JSON với khóa ``type``:
+
+    {"type": "course", "slug": ..., "title": ..., "overview": ...,
+     "owner": "<username>", "subject": {"slug": ..., "title": ...}}
+    {"type": "module", "key": <id cũ>, "order": 0, "title": ..., "description": ...}
+    {"type": "content", "module": <key của module>, "order": 0,
+     "item_type": "text", "item": {"title": ..., "content": ...}}
+
+Các dòng module và content luôn đi sau dòng course mà chúng thuộc về,
+và toàn bộ module của một khóa học đứng trước các content của nó.
+"""
+from .models import Text, File, Image, Video
+
+ITEM_MODELS = {model._meta.model_name: model for model in (Text, File, Image, Video)}
+
+# các field do hệ thống tự quản lý, không xuất ra
+ITEM_EXCLUDED_FIELDS = {'id', 'owner', 'created', 'updated'}
+
+
+def item_fields(model):
+    return [field for field in model._meta.concrete_fields
+            if field.name not in ITEM_EXCLUDED_FIELDS]
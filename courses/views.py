@@ -1,3 +1,4 @@
+import json
 from django.shortcuts import redirect, get_object_or_404
 from django.views.generic import DetailView
 from django.views.generic.base import TemplateResponseMixin, View
@@ -8,15 +9,18 @@ from django.contrib.auth.mixins import LoginRequiredMixin, \
 from django.urls import reverse_lazy
 from django.forms.models import modelform_factory
 from django.apps import apps
-from django.db.models import Count
-from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Value, When
 from django.http import Http404
+from django.utils.cache import patch_cache_control
 from braces.views import CsrfExemptMixin, JsonRequestResponseMixin
 
 # Import các models và forms cần thiết
 from students.forms import CourseEnrollForm
 from .forms import ModuleFormSet
 from .models import Course, Module, Content, Subject, Text, File, Image, Video
+from .catalog import get_subjects, get_courses
+from .conditional import get_not_modified_response, set_course_validators
 from .fields import OrderField  # Giả định OrderField nằm trong file fields.py cùng cấp
 
 
@@ -106,7 +110,8 @@ class ModuleContentListView(TemplateResponseMixin, View):
         module = get_object_or_404(Module,
                                    id=module_id,
                                    course__owner=request.user)
-        return self.render_to_response({'module': module})
+        return self.render_to_response({'module': module,
+                                        'contents': module.contents.with_items()})
 
 
 # --- IV. Content CRUD Views using Template Method Pattern (Đúng 100%) ---
@@ -217,62 +222,89 @@ class ContentDeleteView(View):
 
 # --- V. Các Mixin và Views cho việc sắp xếp lại thứ tự (Order) ---
 class OrderUpdateMixin(CsrfExemptMixin, JsonRequestResponseMixin, View):
+    """
+    Áp dụng thứ tự mới ``{id: order}`` trong một transaction: kiểm tra quyền
+    sở hữu bằng một truy vấn và cập nhật tất cả bằng một lệnh UPDATE ... CASE.
+    """
     model_class = None
     filter_field = None
     order_field = 'order'
+    # lookup từ Course tới các đối tượng được sắp xếp, để cập nhật last_changed
+    course_lookup = None
+
+    def get_request_json(self):
+        # giữ nguyên các cặp (id, order) để phát hiện id bị lặp, vd {"5": 0, "05": 1}
+        try:
+            return json.loads(self.request.body.decode('utf-8'), object_pairs_hook=list)
+        except ValueError:
+            return None
 
     def post(self, request, *args, **kwargs):
         if not self.model_class or not self.filter_field:
             raise NotImplementedError("model_class and filter_field must be set in subclasses.")
+        if not request.user.is_authenticated:
+            return self.render_json_response({'error': 'Authentication required.'}, status=403)
         try:
-            for id, order in self.request_json.items():
-                filter_kwargs = {
-                    'id': id,
-                    self.filter_field: request.user
-                }
-                self.model_class.objects.filter(**filter_kwargs).update(**{self.order_field: order})
-            return self.render_json_response({'saved': 'OK'})
-        except Exception as e:
-            return self.render_json_response({'error': str(e)}, status=400)
+            pairs = [(int(id), int(order)) for id, order in self.request_json]
+        except (TypeError, ValueError):
+            return self.render_json_response({'error': 'Invalid ordering.'}, status=400)
+        ordering = dict(pairs)
+        # cột order là PositiveIntegerField: giá trị âm sẽ gây IntegrityError
+        if len(ordering) != len(pairs) or any(order < 0 for order in ordering.values()):
+            return self.render_json_response({'error': 'Invalid ordering.'}, status=400)
+        with transaction.atomic():
+            owned = set(self.model_class.objects.filter(**{
+                'id__in': list(ordering),
+                self.filter_field: request.user,
+            }).values_list('id', flat=True))
+            if owned != ordering.keys():
+                # id không tồn tại hoặc của người khác: không cập nhật gì cả
+                return self.render_json_response({'error': 'Unknown ids.'}, status=400)
+            if ordering:
+                self.model_class.objects.filter(id__in=list(ordering)).update(**{
+                    self.order_field: Case(
+                        *[When(id=id, then=Value(order)) for id, order in ordering.items()],
+                        output_field=self.model_class._meta.get_field(self.order_field),
+                    )
+                })
+                if self.course_lookup:
+                    Course.touch(**{f'{self.course_lookup}__in': list(ordering)})
+        return self.render_json_response({'saved': 'OK',
+                                          'order': {str(id): order for id, order in ordering.items()}})
 
 
 class ModuleOrderView(OrderUpdateMixin):
     model_class = Module
     filter_field = 'course__owner'
+    course_lookup = 'modules'
 
 
 class ContentOrderView(OrderUpdateMixin):
     model_class = Content
     filter_field = 'module__course__owner'
+    course_lookup = 'modules__contents'
 
 
 # --- VI. Các Views hiển thị danh sách và chi tiết Course công khai ---
 class CacheCourseListMixin(object):
-    """Mixin để thêm caching cho danh sách Course và Subject."""
-
-    def get(self, request, subject=None, *args, **kwargs):
-        subjects = cache.get('all_subjects')
-        if not subjects:
-            subjects = Subject.objects.annotate(total_courses=Count('courses'))
-            cache.set('all_subjects', subjects, 60 * 15)
+    """Mixin để thêm caching cho danh sách Course và Subject.
 
-        all_courses_queryset = Course.objects.annotate(total_modules=Count('modules'))
+    Catalog được lưu trong cache dưới dạng dữ liệu đã tính sẵn (xem
+    ``courses.catalog``) nên khi cache hit không phát sinh truy vấn SQL nào.
+    """
 
+    def get(self, request, subject=None, *args, **kwargs):
+        subjects = get_subjects()
+        subject_obj = None
         if subject:
-            subject_obj = get_object_or_404(Subject, slug=subject)
-            key = f'subject_{subject_obj.id}_courses'
-            courses = cache.get(key)
-            if not courses:
-                courses = all_courses_queryset.filter(subject=subject_obj)
-                cache.set(key, courses, 60 * 15)
-        else:
-            courses = cache.get('all_courses')
-            if not courses:
-                courses = all_courses_queryset
-                cache.set('all_courses', courses, 60 * 15)
+            subject_obj = next((s for s in subjects if s['slug'] == subject),
+                               None)
+            if subject_obj is None:
+                raise Http404('No Subject matches the given query.')
+        courses = get_courses(subject_obj)
 
         return self.render_to_response({'subjects': subjects,
-                                        'subject': subject_obj if subject else None,
+                                        'subject': subject_obj,
                                         'courses': courses})
 
 
@@ -284,6 +316,20 @@ class CourseDetailView(DetailView):
     model = Course
     template_name = 'courses/course/detail.html'
 
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if request.user.is_authenticated:
+            # trang chứa csrf_token của phiên hiện tại (đổi khi đăng nhập lại):
+            # một bản cũ trả về qua 304 sẽ làm form ghi danh bị từ chối
+            response = self.render_to_response(self.get_context_data(object=self.object))
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        not_modified = get_not_modified_response(request, self.object)
+        if not_modified is not None:
+            return not_modified
+        context = self.get_context_data(object=self.object)
+        return set_course_validators(self.render_to_response(context), self.object)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['enroll_form'] = CourseEnrollForm(initial={'course': self.object})
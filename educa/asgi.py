@@ -12,15 +12,19 @@ import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
-import chat.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'educa.settings')
 
 django_asgi_app = get_asgi_application()
 
+# imported after setup: the chat modules load models
+import chat.routing  # noqa: E402
+from chat.lifespan import lifespan  # noqa: E402
+
 application = ProtocolTypeRouter({
     'http': django_asgi_app,
     'websocket': AuthMiddlewareStack(
         URLRouter(chat.routing.websocket_urlpatterns)
     ),
+    'lifespan': lifespan,
 })
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -143,11 +144,29 @@ from django.urls import reverse_lazy
 LOGIN_REDIRECT_URL = reverse_lazy('student_course_list')
 
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    # shared by every web/ASGI worker (and management commands), so cache
+    # invalidations reach all processes and cached data can live long
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
     }
-}
+    CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+    ENROLLMENT_CACHE_TIMEOUT = 60 * 60 * 24
+else:
+    # per-process cache: an invalidation only reaches the process that made
+    # the change, so data other processes may change must expire quickly
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    CATALOG_CACHE_TIMEOUT = 60
+    ENROLLMENT_CACHE_TIMEOUT = 60
 
 
 CACHE_MIDDLEWARE_ALIAS = 'default'
@@ -170,9 +189,18 @@ REST_FRAMEWORK = {
 ASGI_APPLICATION = 'educa.asgi.application'
 
 
+# shared by every ASGI worker on this host through a broker process that the
+# first worker starts (or run it yourself with manage.py run_chat_broker);
+# use channels.layers.InMemoryChannelLayer for a single worker, or
+# channels_redis across several hosts
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'BACKEND': 'chat.layers.UnixSocketChannelLayer',
+        'CONFIG': {
+            'path': BASE_DIR / 'chat-layer.sock',
+            'capacity': 100,
+            'expiry': 60,
+        },
     }
 }
 STATIC_ROOT = BASE_DIR / 'staticfiles'
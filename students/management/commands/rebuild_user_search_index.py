@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from students.search import index_users
+
+
+class Command(BaseCommand):
+    help = 'Dựng lại index tìm kiếm người dùng (vd: sau khi nhập dữ liệu hàng loạt không qua signal).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch, total = [], 0
+        for user in User.objects.order_by('pk').iterator(chunk_size=options['batch_size']):
+            batch.append(user)
+            if len(batch) >= options['batch_size']:
+                index_users(batch)
+                total += len(batch)
+                batch = []
+        index_users(batch)
+        total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'Đã đánh index {total} người dùng.'))
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# bản sao của students.search tại thời điểm tạo migration: migration không
+# được phụ thuộc vào code có thể thay đổi sau này
+SEARCH_FIELDS = ('username', 'email', 'first_name', 'last_name')
+BATCH_SIZE = 1000
+
+
+def fill_search_index(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    UserSearchIndex = apps.get_model('students', 'UserSearchIndex')
+    UserSearchTrigram = apps.get_model('students', 'UserSearchTrigram')
+    db = schema_editor.connection.alias
+    # có thể còn dữ liệu nếu migration được áp dụng lại sau khi rollback
+    UserSearchIndex.objects.using(db).all().delete()
+    UserSearchTrigram.objects.using(db).all().delete()
+    entries, grams = [], []
+    users = User.objects.using(db).order_by('pk').values('pk', *SEARCH_FIELDS)
+    for user in users.iterator(chunk_size=BATCH_SIZE):
+        values = {field: (user[field] or '').strip().lower() for field in SEARCH_FIELDS}
+        entries.append(UserSearchIndex(user_id=user['pk'], **values))
+        user_grams = {value[i:i + 3] for value in values.values() for i in range(len(value) - 2)}
+        grams.extend(UserSearchTrigram(trigram=gram, user_id=user['pk']) for gram in user_grams)
+        if len(entries) >= BATCH_SIZE:
+            UserSearchIndex.objects.using(db).bulk_create(entries)
+            UserSearchTrigram.objects.using(db).bulk_create(grams, batch_size=BATCH_SIZE)
+            entries, grams = [], []
+    UserSearchIndex.objects.using(db).bulk_create(entries)
+    UserSearchTrigram.objects.using(db).bulk_create(grams, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0002_user_search_index'),
+    ]
+
+    operations = [
+        # chiều ngược không cần làm gì: chiều xuôi luôn dựng lại từ đầu
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
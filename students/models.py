@@ -1,7 +1,11 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.hashers import make_password
-from django.db import models
+from django.db import models, transaction
 
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -17,6 +21,51 @@ class Teacher(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.department}"
 
+class UserSearchIndex(models.Model):
+    """
+    Bản sao (chữ thường) các trường dùng để tìm kiếm người dùng, có index
+    để tìm theo tiền tố bằng range scan thay vì quét cả bảng.
+    """
+    user = models.OneToOneField(User, primary_key=True, related_name='search_index', on_delete=models.CASCADE)
+    username = models.CharField(max_length=150, db_index=True)
+    email = models.CharField(max_length=254, db_index=True)
+    first_name = models.CharField(max_length=150, db_index=True)
+    last_name = models.CharField(max_length=150, db_index=True)
+
+    def __str__(self):
+        return self.username
+
+class UserSearchTrigram(models.Model):
+    """Danh sách trigram của từng người dùng, dùng cho tìm kiếm chuỗi con."""
+    trigram = models.CharField(max_length=3)
+    user = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('trigram', 'user')
+
+    def __str__(self):
+        return f"{self.trigram} - {self.user_id}"
+
+# PASSWORD HASHING
+_hash_pool = None
+
+def hash_passwords(raw_passwords: list) -> list:
+    """
+    Băm danh sách mật khẩu. Với lô lớn, công việc (tốn CPU) được chia
+    cho một process pool dùng chung; số worker lấy từ
+    settings.USER_PASSWORD_HASH_WORKERS (mặc định: số CPU).
+    """
+    global _hash_pool
+    workers = getattr(settings, 'USER_PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+    if workers <= 1 or len(raw_passwords) < 2:
+        return [make_password(raw) for raw in raw_passwords]
+    if _hash_pool is None:
+        # spawn: không fork tiến trình web đang chạy nhiều thread
+        _hash_pool = ProcessPoolExecutor(max_workers=workers,
+                                         mp_context=multiprocessing.get_context('spawn'))
+    chunksize = max(1, len(raw_passwords) // (workers * 4))
+    return list(_hash_pool.map(make_password, raw_passwords, chunksize=chunksize))
+
 # INTERFACE
 class UserInterface(ABC):
     @abstractmethod
@@ -26,7 +75,21 @@ class UserInterface(ABC):
     def getEmail(self) -> str: pass
 
     @abstractmethod
-    def save(self) -> dict: pass
+    def buildProfile(self) -> models.Model: pass
+
+    @abstractmethod
+    def toDict(self) -> dict: pass
+
+    def setPasswordHash(self, encoded: str):
+        # cho phép băm mật khẩu theo lô ở nơi khác (xem hash_passwords)
+        self.user.password = encoded
+
+    def save(self) -> dict:
+        if not self.user.password:
+            self.user.password = make_password(self.raw_password)
+        self.user.save()
+        self.buildProfile().save()
+        return self.toDict()
 
 # Student Concrete Product
 class StudentUser(UserInterface):
@@ -34,11 +97,11 @@ class StudentUser(UserInterface):
         self.user = User(
             username=username,
             email=email,
-            password=make_password(password),
             is_active=True,
             is_staff=False,
             is_superuser=False
         )
+        self.raw_password = password
         self.class_name = class_name
 
     def getUsername(self) -> str:
@@ -47,9 +110,10 @@ class StudentUser(UserInterface):
     def getEmail(self) -> str:
         return self.user.email
 
-    def save(self) -> dict:
-        self.user.save()
-        Student.objects.create(user=self.user, class_name=self.class_name)
+    def buildProfile(self) -> models.Model:
+        return Student(user=self.user, class_name=self.class_name)
+
+    def toDict(self) -> dict:
         return {
             "id": self.user.id,
             "username": self.user.username,
@@ -64,11 +128,11 @@ class TeacherUser(UserInterface):
         self.user = User(
             username=username,
             email=email,
-            password=make_password(password),
             is_active=True,
             is_staff=True,
             is_superuser=False
         )
+        self.raw_password = password
         self.department = department
 
     def getUsername(self) -> str:
@@ -77,9 +141,10 @@ class TeacherUser(UserInterface):
     def getEmail(self) -> str:
         return self.user.email
 
-    def save(self) -> dict:
-        self.user.save()
-        Teacher.objects.create(user=self.user, department=self.department)
+    def buildProfile(self) -> models.Model:
+        return Teacher(user=self.user, department=self.department)
+
+    def toDict(self) -> dict:
         return {
             "id": self.user.id,
             "username": self.user.username,
@@ -108,7 +173,7 @@ class UserOperation(ABC):
     def execute(self, data: dict) -> any: pass
 
 class CreateUser(UserOperation):
-    def execute(self, data):
+    def build(self, data) -> UserInterface:
         user_type = data['type']
         if user_type == 'student':
             factory = StudentFactory()
@@ -128,7 +193,55 @@ class CreateUser(UserOperation):
             )
         else:
             raise ValueError("Loại người dùng không hợp lệ.")
-        return user.save()
+        return user
+
+    def execute(self, data):
+        return self.build(data).save()
+
+    def execute_many(self, items: list) -> list:
+        """
+        Tạo nhiều người dùng cùng lúc: mật khẩu được băm song song trên
+        process pool, User và Student/Teacher được chèn bằng bulk_create.
+        Trả về kết quả cho từng phần tử theo đúng thứ tự đầu vào.
+        """
+        results = [None] * len(items)
+        products = {}
+        for index, data in enumerate(items):
+            try:
+                products[index] = self.build(data)
+            except KeyError as e:
+                results[index] = {"error": f"Thiếu trường {e}"}
+            except ValueError as e:
+                results[index] = {"error": str(e)}
+
+        # username trùng trong lô hoặc đã có trong cơ sở dữ liệu
+        usernames = [product.getUsername() for product in products.values()]
+        taken = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        seen = set()
+        for index, product in list(products.items()):
+            username = product.getUsername()
+            if username in taken or username in seen:
+                results[index] = {"error": f"Tên đăng nhập {username} đã tồn tại."}
+                del products[index]
+            seen.add(username)
+
+        if products:
+            hashes = hash_passwords([product.raw_password for product in products.values()])
+            for product, encoded in zip(products.values(), hashes):
+                product.setPasswordHash(encoded)
+            User.objects.bulk_create([product.user for product in products.values()])
+            profiles = {}
+            for product in products.values():
+                profile = product.buildProfile()
+                profiles.setdefault(type(profile), []).append(profile)
+            for model, objs in profiles.items():
+                model.objects.bulk_create(objs)
+            # bulk_create không phát post_save nên phải tự cập nhật index tìm kiếm
+            from .search import index_users
+            index_users([product.user for product in products.values()])
+            for index, product in products.items():
+                results[index] = {"result": product.toDict()}
+        return results
 
 
 class UpdateUser(UserOperation):
@@ -177,9 +290,11 @@ class DeleteUser(UserOperation):
 
 class SearchUser(UserOperation):
     def execute(self, data):
-        query = data.get('query', '')
-        results = User.objects.filter(username__icontains=query)
-        return list(results.values('id', 'username', 'email', 'is_staff'))
+        from .search import search_users, SEARCH_PAGE_SIZE
+        results, next_cursor = search_users(data.get('query', ''),
+                                            after=data.get('after'),
+                                            limit=data.get('limit', SEARCH_PAGE_SIZE))
+        return {"results": results, "next": next_cursor}
 
 # OPERATION FACTORY
 class UserOperationFactory:
@@ -191,3 +306,36 @@ class UserOperationFactory:
             case 'delete': return DeleteUser()
             case 'search': return SearchUser()
             case _: raise ValueError("Hành động không hợp lệ.")
+
+def execute_operations(operations: list) -> list:
+    """
+    Thực thi một mảng thao tác trong cùng một transaction và trả về kết quả
+    cho từng thao tác. Các thao tác 'create' liên tiếp được gộp thành một lô
+    (CreateUser.execute_many); mỗi thao tác khác chạy trong savepoint riêng
+    để lỗi của một phần tử không làm hỏng các phần tử còn lại.
+    """
+    results = []
+    with transaction.atomic():
+        index = 0
+        while index < len(operations):
+            data = dict(operations[index])
+            action = data.pop("action", None)
+            if action == 'create':
+                batch = []
+                while index < len(operations) and operations[index].get("action") == 'create':
+                    batch.append({k: v for k, v in operations[index].items() if k != "action"})
+                    index += 1
+                try:
+                    with transaction.atomic():
+                        results.extend(CreateUser().execute_many(batch))
+                except Exception as e:
+                    results.extend({"error": str(e)} for _ in batch)
+                continue
+            try:
+                with transaction.atomic():
+                    operation = UserOperationFactory.get_operation(action)
+                    results.append({"result": operation.execute(data)})
+            except Exception as e:
+                results.append({"error": str(e)})
+            index += 1
+    return results
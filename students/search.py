@@ -0,0 +1,105 @@
+import base64
+import json
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from .models import UserSearchIndex, UserSearchTrigram
+
+SEARCH_FIELDS = ('username', 'email', 'first_name', 'last_name')
+# số kết quả tối đa của một trang, bất kể client yêu cầu bao nhiêu
+SEARCH_PAGE_CAP = 50
+SEARCH_PAGE_SIZE = 20
+
+
+def normalize(value):
+    return (value or '').strip().lower()
+
+
+def trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def index_users(users):
+    """Tạo lại các dòng index (trường chữ thường + trigram) cho ``users``."""
+    users = list(users)
+    if not users:
+        return
+    user_ids = [user.pk for user in users]
+    UserSearchIndex.objects.filter(user_id__in=user_ids).delete()
+    UserSearchTrigram.objects.filter(user_id__in=user_ids).delete()
+    entries, grams = [], []
+    for user in users:
+        values = {field: normalize(getattr(user, field)) for field in SEARCH_FIELDS}
+        entries.append(UserSearchIndex(user_id=user.pk, **values))
+        user_grams = set()
+        for value in values.values():
+            user_grams |= trigrams(value)
+        grams.extend(UserSearchTrigram(trigram=gram, user_id=user.pk) for gram in user_grams)
+    UserSearchIndex.objects.bulk_create(entries)
+    UserSearchTrigram.objects.bulk_create(grams, batch_size=1000)
+
+
+def _prefix(field, query):
+    # range scan trên index thay cho LIKE 'query%'
+    return Q(**{f'{field}__gte': query, f'{field}__lt': query + '\uffff'})
+
+
+def encode_cursor(rank, username, user_id):
+    raw = json.dumps([rank, username, user_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        rank, username, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(rank), str(username), int(user_id)
+    except (ValueError, TypeError):
+        raise ValueError("Cursor không hợp lệ.")
+
+
+def search_users(query, after=None, limit=SEARCH_PAGE_SIZE):
+    """
+    Tìm người dùng theo username, email, họ, tên. Kết quả được xếp hạng:
+    0 - trùng username, 1 - username bắt đầu bằng query, 2 - email/họ/tên
+    bắt đầu bằng query, 3 - chứa query (qua index trigram, cần >= 3 ký tự).
+    Phân trang keyset theo (rank, username, id); trả về (kết quả, cursor kế tiếp).
+    """
+    query = normalize(query)
+    limit = max(1, min(int(limit), SEARCH_PAGE_CAP))
+    prefix_match = Q()
+    for field in SEARCH_FIELDS:
+        prefix_match |= _prefix(field, query)
+    match = prefix_match
+    grams = trigrams(query)
+    if grams:
+        candidates = UserSearchTrigram.objects.filter(trigram__in=grams) \
+            .values('user_id').annotate(n=Count('trigram')).filter(n=len(grams)) \
+            .values('user_id')
+        contains = Q()
+        for field in SEARCH_FIELDS:
+            contains |= Q(**{f'{field}__contains': query})
+        match |= Q(user_id__in=candidates) & contains
+
+    qs = UserSearchIndex.objects.filter(match).annotate(rank=Case(
+        When(username=query, then=Value(0)),
+        When(_prefix('username', query), then=Value(1)),
+        When(prefix_match, then=Value(2)),
+        default=Value(3),
+        output_field=IntegerField(),
+    ))
+    if after:
+        rank, username, user_id = decode_cursor(after)
+        qs = qs.filter(Q(rank__gt=rank)
+                       | Q(rank=rank, username__gt=username)
+                       | Q(rank=rank, username=username, user_id__gt=user_id))
+    rows = list(qs.order_by('rank', 'username', 'user_id')
+                  .values('rank', 'username', 'user_id', 'user__username',
+                          'user__email', 'user__is_staff')[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last['rank'], last['username'], last['user_id'])
+    results = [{'id': row['user_id'],
+                'username': row['user__username'],
+                'email': row['user__email'],
+                'is_staff': row['user__is_staff']} for row in rows]
+    return results, next_cursor
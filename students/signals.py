@@ -0,0 +1,15 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .search import SEARCH_FIELDS, index_users
+
+
+@receiver(post_save, sender=User)
+def update_user_search_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    # dòng index bị xóa theo CASCADE khi người dùng bị xóa
+    if raw:
+        return
+    if update_fields is not None and not set(SEARCH_FIELDS) & set(update_fields):
+        # vd: update_last_login khi đăng nhập
+        return
+    index_users([instance])
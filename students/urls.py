@@ -1,6 +1,5 @@
 from django.urls import path
 from .views import UserActionView
-from django.views.decorators.cache import cache_page
 from . import views
 
 
@@ -16,10 +15,10 @@ urlpatterns = [
          views.StudentCourseListView.as_view(),
          name='student_course_list'),
     path('course/<pk>/',
-         cache_page(60 * 15)(views.StudentCourseDetailView.as_view()),
+         views.StudentCourseDetailView.as_view(),
          name='student_course_detail'),
     path('course/<pk>/<module_id>/',
-         cache_page(60 * 15)(views.StudentCourseDetailView.as_view()),
+         views.StudentCourseDetailView.as_view(),
          name='student_course_detail_module'),
 
 ]
@@ -2,7 +2,7 @@
 import json
 from django.http import JsonResponse, HttpResponseBadRequest, Http404
 from django.views import View
-from students.models import UserOperationFactory
+from students.models import UserOperationFactory, execute_operations
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.core.serializers.json import DjangoJSONEncoder
@@ -14,7 +14,10 @@ from django.views.generic.edit import FormView
 from django.views.generic.list import ListView
 from django.views.generic.detail import DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from courses.models import Course
+from courses.models import Course, Content
+from courses.catalog import get_course_navigation
+from courses.enrollment import get_enrolled_course_ids, is_enrolled
+from courses.conditional import get_not_modified_response, set_course_validators
 from .forms import CourseEnrollForm
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -22,6 +25,14 @@ class UserActionView(View):
     def post(self, request):
         try:
             data = json.loads(request.body)
+            # nhiều thao tác: [{...}, ...] hoặc {"operations": [{...}, ...]}
+            operations = data if isinstance(data, list) else data.get("operations")
+            if operations is not None:
+                if not isinstance(operations, list) or \
+                        not all(isinstance(item, dict) for item in operations):
+                    return HttpResponseBadRequest("'operations' phải là một mảng object")
+                results = execute_operations(operations)
+                return JsonResponse({"results": results}, encoder=DjangoJSONEncoder, status=200)
             action = data.pop("action", None)
             if not action:
                 return HttpResponseBadRequest("Thiếu trường 'action'")
@@ -62,26 +73,43 @@ class StudentCourseListView(LoginRequiredMixin, ListView):
     template_name = 'students/course/list.html'
     def get_queryset(self):
         qs = super().get_queryset()
-        return qs.filter(students__in=[self.request.user])
+        return qs.filter(pk__in=get_enrolled_course_ids(self.request.user))
 
 
-class StudentCourseDetailView(DetailView):
+class StudentCourseDetailView(LoginRequiredMixin, DetailView):
     model = Course
     template_name = 'students/course/detail.html'
 
-    def get_queryset(self):
-        qs = super().get_queryset()
-        return qs.filter(students__in=[self.request.user])
+    def get_object(self, queryset=None):
+        course = super().get_object(queryset)
+        if not is_enrolled(self.request.user, course.pk):
+            raise Http404('No Course matches the given query.')
+        return course
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        not_modified = get_not_modified_response(request, self.object)
+        if not_modified is not None:
+            return not_modified
+        context = self.get_context_data(object=self.object)
+        return set_course_validators(self.render_to_response(context), self.object)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # get course object
-        course = self.get_object()
+        # danh sách module lấy từ cache dùng chung cho cả khóa học
+        navigation = get_course_navigation(self.object)
         if 'module_id' in self.kwargs:
             # get current module
-            context['module'] = course.modules.get(
-                                    id=self.kwargs['module_id'])
+            module = next((m for m in navigation
+                           if str(m['id']) == str(self.kwargs['module_id'])), None)
+            if module is None:
+                raise Http404('No module matches the given query.')
         else:
             # get first module
-            context['module'] = course.modules.all()[0]
-        return context
\ No newline at end of file
+            module = navigation[0] if navigation else None
+        context['navigation'] = navigation
+        context['module'] = module
+        if module:
+            # queryset lười: chỉ được thực thi khi fragment cache bị miss
+            context['contents'] = Content.objects.filter(module_id=module['id']).with_items()
+        return context